@@ -0,0 +1,293 @@
+"""
+Генератор данных для нагрузочных тестов.
+
+Создаёт в базе из ``benchmarks/settings.py`` пользователей и группы
+(через mixer), посты и комментарии с русским текстом Faker, граф
+подписок со степенным распределением популярности авторов и набор
+изображений с готовыми копиями. Посты и комментарии вставляются
+пачками ``bulk_create`` в обход сигналов, поэтому после загрузки
+счётчики, поисковый индекс и ленты пересобираются целиком.
+
+    python benchmarks/generate_data.py --reset --users 20000 \\
+        --posts 2000000 --comments 500000
+
+У всех пользователей пароль ``BENCH_PASSWORD``; пользователь ``bench``
+подписан на самых популярных авторов и нужен сценариям с входом.
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from io import BytesIO
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.core.files.base import ContentFile  # noqa: E402
+from django.core.files.storage import default_storage  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from faker import Faker  # noqa: E402
+from mixer.backend.django import Mixer  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from posts import counters, feeds, images, search  # noqa: E402
+from posts.importer import explicit_dates  # noqa: E402
+from posts.models import Comment, Follow, Group, Post  # noqa: E402
+
+User = get_user_model()
+
+BENCH_USERNAME = 'bench'
+BENCH_PASSWORD = 'bench-password'
+BENCH_FOLLOWS = 50
+TEXT_POOL_SIZE = 2000
+
+
+def zipf_weights(count, skew):
+    """Накопленные веса рангов: первый в ``count ** skew`` раз популярнее."""
+    return list(itertools.accumulate(
+        1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def batches(items, size):
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Generator:
+    def __init__(self, options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        Faker.seed(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.mixer = Mixer(commit=False)
+        self.now = timezone.now()
+        self.texts = [
+            self.faker.paragraph(nb_sentences=self.random.randint(1, 6))
+            for _ in range(TEXT_POOL_SIZE)
+        ]
+
+    def log(self, message):
+        print(f'{time.strftime("%H:%M:%S")} {message}', flush=True)
+
+    def run(self):
+        options = self.options
+        self.log('пользователи')
+        self.users = self.create_users(options['users'])
+        self.popular = self.random.sample(self.users, len(self.users))
+        self.weights = zipf_weights(len(self.popular), options['skew'])
+        self.log('группы')
+        self.groups = self.create_groups(options['groups'])
+        self.log('подписки')
+        follows = self.create_follows(options['follows'])
+        self.log('изображения')
+        self.images = self.create_images(options['image_sources'])
+        self.log('посты')
+        self.first_post, self.span = self.create_posts(options['posts'])
+        self.log('комментарии')
+        self.create_comments(options['comments'])
+        self.log('счётчики')
+        with transaction.atomic():
+            counters.rebuild()
+        self.log('поисковый индекс')
+        search.rebuild()
+        self.log('ленты')
+        entries = feeds.rebuild()
+        self.log(
+            f'готово: {len(self.users)} пользователей, {follows} подписок, '
+            f'{options["posts"]} постов, {entries} записей в лентах')
+
+    def create_users(self, count):
+        password = make_password(BENCH_PASSWORD)
+        start = (User.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0) + 1
+        names = [BENCH_USERNAME] + [
+            f'user{number}' for number in range(start, start + count - 1)]
+        existing = set(User.objects.values_list('username', flat=True))
+        names = [name for name in names if name not in existing]
+        users = [
+            self.mixer.blend(
+                User, username=name, password=password,
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                is_staff=False, is_superuser=False, is_active=True,
+            )
+            for name in names
+        ]
+        for batch in batches(users, self.options['batch_size']):
+            User.objects.bulk_create(batch)
+        return list(User.objects.values_list('pk', flat=True))
+
+    def create_groups(self, count):
+        existing = Group.objects.count()
+        groups = [
+            self.mixer.blend(
+                Group, slug=f'group-{number}',
+                title=self.faker.sentence(nb_words=3)[:200],
+                description=self.faker.paragraph(),
+            )
+            for number in range(existing, existing + count)
+        ]
+        Group.objects.bulk_create(groups)
+        return list(Group.objects.values_list('pk', flat=True))
+
+    def pick_authors(self, count):
+        return self.random.choices(
+            self.popular, cum_weights=self.weights, k=count)
+
+    def create_follows(self, mean):
+        bench = User.objects.get(username=BENCH_USERNAME).pk
+        pairs = set(Follow.objects.values_list('user_id', 'author_id'))
+        new = []
+        for user_id in self.users:
+            wanted = min(
+                len(self.users) - 1,
+                max(1, round(self.random.expovariate(1 / mean))))
+            if user_id == bench:
+                authors = self.popular[:BENCH_FOLLOWS]
+            else:
+                authors = self.pick_authors(wanted * 2)
+            for author_id in dict.fromkeys(authors):
+                if author_id != user_id and (user_id, author_id) not in pairs:
+                    pairs.add((user_id, author_id))
+                    new.append(Follow(user_id=user_id, author_id=author_id))
+        for batch in batches(new, self.options['batch_size']):
+            Follow.objects.bulk_create(batch)
+        return len(new)
+
+    def create_images(self, count):
+        """Исходники и копии; посты делят между собой одни и те же файлы."""
+        sources = []
+        for number in range(count):
+            image = Image.new('RGB', (1600, 900), self.color())
+            draw = ImageDraw.Draw(image)
+            for _ in range(12):
+                x, y = self.random.randrange(1600), self.random.randrange(900)
+                draw.ellipse(
+                    (x, y, x + self.random.randrange(50, 600),
+                     y + self.random.randrange(50, 400)),
+                    fill=self.color())
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=85)
+            name = default_storage.save(
+                f'posts/bench-{number}.jpg', ContentFile(buffer.getvalue()))
+            meta = images.dump_meta(
+                name, images.READY, images.build_renditions(name))
+            sources.append((name, meta))
+        return sources
+
+    def color(self):
+        return tuple(self.random.randrange(256) for _ in range(3))
+
+    def post_date(self, number, count):
+        """Даты растут вместе с id и покрывают последние два года."""
+        step = timedelta(days=730) / max(count, 1)
+        return self.now - timedelta(days=730) + step * number
+
+    def create_posts(self, count):
+        start = (Post.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0) + 1
+        authors = self.pick_authors(count)
+        image_ratio = self.options['image_ratio']
+
+        def posts():
+            for number in range(count):
+                image, meta = '', ''
+                if self.images and self.random.random() < image_ratio:
+                    image, meta = self.random.choice(self.images)
+                group = None
+                if self.groups and self.random.random() < 0.7:
+                    group = self.random.choice(self.groups)
+                yield Post(
+                    id=start + number,
+                    text=self.random.choice(self.texts),
+                    pub_date=self.post_date(number, count),
+                    author_id=authors[number],
+                    group_id=group,
+                    image=image,
+                    image_renditions=meta,
+                )
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            self.insert(Post, posts(), count)
+        return start, count
+
+    def create_comments(self, count):
+        if not self.span:
+            return
+        recent = max(1, self.span // 10)
+
+        def comments():
+            for _ in range(count):
+                if self.random.random() < 0.8:
+                    number = self.span - 1 - self.random.randrange(recent)
+                else:
+                    number = self.random.randrange(self.span)
+                yield Comment(
+                    post_id=self.first_post + number,
+                    author_id=self.random.choice(self.users),
+                    text=self.random.choice(self.texts)[:300],
+                    created=self.post_date(number, self.span) + timedelta(
+                        minutes=self.random.randrange(1, 60 * 24)),
+                )
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.insert(Comment, comments(), count)
+
+    def insert(self, model, objects, total):
+        done = 0
+        for batch in batches(objects, self.options['batch_size']):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            done += len(batch)
+            if done % (self.options['batch_size'] * 20) == 0:
+                self.log(f'  {model.__name__}: {done} из {total}')
+
+
+def reset():
+    name = settings.DATABASES['default']['NAME']
+    connection.close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(name + suffix):
+            os.remove(name + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--reset', action='store_true',
+                        help='Удалить базу для тестов и создать заново')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--follows', type=float, default=20,
+                        help='Среднее число подписок пользователя')
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help='Показатель степенного распределения авторов')
+    parser.add_argument('--image-ratio', type=float, default=0.1)
+    parser.add_argument('--image-sources', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    options = vars(parser.parse_args())
+    if options['reset']:
+        reset()
+    call_command('migrate', verbosity=0)
+    Generator(options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+"""
+Нагрузочный прогон страниц постов и входа пользователей.
+
+Каждый сценарий — одна страница в одном состоянии (аноним или вошедший
+``bench``) со случайными параметрами из данных ``generate_data.py``.
+Запросы выполняются тестовым клиентом Django (``--driver client``, без
+сети) или по HTTP через WSGI-сервер в том же процессе (``--driver
+wsgi``, ``--concurrency`` потоков). Для каждого сценария печатаются
+p50/p95/p99 в миллисекундах и число запросов в секунду.
+
+    python benchmarks/run.py --driver wsgi --requests 300 --concurrency 4
+    python benchmarks/run.py --save-baseline
+    python benchmarks/run.py --check --threshold 0.25
+
+``--check`` сравнивает результат с ``baselines.json`` и завершается с
+кодом 1, если p95 сценария вырос больше чем на порог (и хотя бы на
+``--min-delta`` мс) или сценарий вернул неожиданный код ответа.
+Базовые значения зависят от машины и объёма данных: сохраняйте их на
+той же машине, где запускаете проверку.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import requests  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from benchmarks.generate_data import (  # noqa: E402
+    BENCH_PASSWORD, BENCH_USERNAME)
+from posts.models import Group, Post  # noqa: E402
+
+User = get_user_model()
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'baselines.json')
+SAMPLE_SIZE = 200
+
+Scenario = namedtuple(
+    'Scenario', ('name', 'auth', 'method', 'build', 'expect', 'prepare'))
+
+
+def scenario(name, auth, build, method='get', expect=(200,), prepare=None):
+    return Scenario(name, auth, method, build, expect, prepare)
+
+
+class Sample:
+    """Случайные, но воспроизводимые параметры запросов из базы."""
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        authors = User.objects.order_by('-stats__followers_count')
+        self.popular = list(
+            authors.values_list('username', flat=True)[:SAMPLE_SIZE])
+        self.users = list(User.objects.order_by('?').values_list(
+            'username', flat=True)[:SAMPLE_SIZE])
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        self.posts = list(Post.objects.order_by('?').values_list(
+            'pk', flat=True)[:SAMPLE_SIZE])
+        self.commented = list(Post.objects.order_by(
+            '-comments_count').values_list('pk', flat=True)[:SAMPLE_SIZE])
+        texts = Post.objects.order_by('?').values_list(
+            'text', flat=True)[:SAMPLE_SIZE]
+        self.words = [
+            word for text in texts for word in re.findall(r'\w{5,}', text)]
+        self.scale = {
+            'users': User.objects.count(), 'posts': Post.objects.count()}
+        if not (self.popular and self.posts and self.groups):
+            raise SystemExit(
+                'Нет данных: сначала запустите benchmarks/generate_data.py')
+
+    def pick(self, values):
+        return self.random.choice(values)
+
+
+def scenarios(sample):
+    def post_url(name, source=None):
+        return lambda: reverse(
+            f'posts:{name}',
+            kwargs={'post_id': sample.pick(source or sample.posts)})
+
+    def profile_url(name, source):
+        return lambda: reverse(
+            f'posts:{name}', kwargs={'username': sample.pick(source)})
+
+    return [
+        scenario('posts:index', 'anon', lambda: reverse('posts:index')),
+        scenario('posts:index', 'user', lambda: reverse('posts:index')),
+        scenario('posts:index?page=50', 'anon',
+                 lambda: reverse('posts:index') + '?page=50'),
+        scenario('posts:group_posts', 'anon', lambda: reverse(
+            'posts:group_posts', kwargs={'slug': sample.pick(sample.groups)})),
+        scenario('posts:profile', 'anon',
+                 profile_url('profile', sample.popular)),
+        scenario('posts:profile', 'user',
+                 profile_url('profile', sample.users)),
+        scenario('posts:post_detail', 'anon', post_url('post_detail')),
+        scenario('posts:post_detail', 'user',
+                 post_url('post_detail', sample.commented)),
+        scenario('posts:comment_list', 'anon', lambda: reverse(
+            'posts:comment_list',
+            kwargs={'post_id': sample.pick(sample.commented)}
+        ) + '?format=json'),
+        scenario('posts:search', 'anon', lambda: reverse(
+            'posts:search') + f'?q={sample.pick(sample.words)}'),
+        scenario('posts:follow_index', 'user',
+                 lambda: reverse('posts:follow_index')),
+        scenario('posts:post_create', 'user',
+                 lambda: reverse('posts:post_create')),
+        scenario('posts:post_create', 'user',
+                 lambda: (reverse('posts:post_create'),
+                          {'text': 'Нагрузочный пост'}),
+                 method='post', expect=(302,)),
+        scenario('posts:add_comment', 'user',
+                 lambda: (post_url('add_comment')(),
+                          {'text': 'Нагрузочный комментарий'}),
+                 method='post', expect=(302,)),
+        scenario('posts:profile_follow', 'user',
+                 profile_url('profile_follow', sample.users),
+                 expect=(302,)),
+        scenario('users:login', 'anon', lambda: reverse('users:login')),
+        scenario('users:login', 'anon',
+                 lambda: (reverse('users:login'), {
+                     'username': BENCH_USERNAME, 'password': BENCH_PASSWORD,
+                 }),
+                 method='post', expect=(302,)),
+        scenario('users:signup', 'anon', lambda: reverse('users:signup')),
+        scenario('users:PasswordChangeView', 'user',
+                 lambda: reverse('users:PasswordChangeView')),
+        scenario('users:logout', 'user', lambda: reverse('users:logout'),
+                 prepare=lambda session: session.log_in()),
+    ]
+
+
+class ClientSession:
+    """Сессия тестового клиента Django: без сети и без проверки CSRF."""
+
+    def __init__(self, auth):
+        self.client = Client()
+        self.auth = auth
+        if auth == 'user':
+            self.log_in()
+
+    def log_in(self):
+        self.client.force_login(User.objects.get(username=BENCH_USERNAME))
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data).status_code
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class WsgiSession:
+    """Сессия ``requests`` к WSGI-серверу с входом через форму."""
+    base_url = None
+
+    def __init__(self, auth):
+        self.http = requests.Session()
+        if auth == 'user':
+            self.log_in()
+
+    @classmethod
+    def start(cls):
+        server = make_server(
+            '127.0.0.1', 0, get_wsgi_application(),
+            server_class=ThreadingServer, handler_class=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        cls.base_url = 'http://%s:%d' % server.server_address
+        return server
+
+    def log_in(self):
+        self.post(reverse('users:login'), {
+            'username': BENCH_USERNAME, 'password': BENCH_PASSWORD})
+
+    def get(self, path):
+        return self.http.get(
+            self.base_url + path, allow_redirects=False).status_code
+
+    def post(self, path, data):
+        if settings.CSRF_COOKIE_NAME not in self.http.cookies:
+            self.http.get(self.base_url + reverse('users:login'))
+        data = dict(
+            data,
+            csrfmiddlewaretoken=self.http.cookies.get(
+                settings.CSRF_COOKIE_NAME, ''))
+        return self.http.post(
+            self.base_url + path, data, allow_redirects=False).status_code
+
+
+DRIVERS = {'client': ClientSession, 'wsgi': WsgiSession}
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(share * len(ordered)))
+    return ordered[rank - 1]
+
+
+def measure(session_class, item, requests_count, concurrency, warmup):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(requests_count + warmup * concurrency))
+
+    def worker():
+        session = session_class(item.auth)
+        done = 0
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            if item.prepare is not None:
+                item.prepare(session)
+            target = item.build()
+            start = time.perf_counter()
+            if item.method == 'post':
+                status = session.post(*target)
+            else:
+                status = session.get(target)
+            elapsed = time.perf_counter() - start
+            done += 1
+            if done <= warmup:
+                continue
+            with lock:
+                latencies.append(elapsed)
+                if status not in item.expect:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return {
+        'p50': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99': round(percentile(latencies, 0.99) * 1000, 2),
+        'rps': round(len(latencies) / wall, 1),
+        'errors': len(errors),
+    }
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Описания регрессий относительно базовых значений."""
+    problems = []
+    for name, result in results.items():
+        if result['errors']:
+            problems.append(f'{name}: неожиданных ответов {result["errors"]}')
+        base = baseline.get(name)
+        if base is None:
+            continue
+        limit = base['p95'] * (1 + threshold)
+        if result['p95'] > limit and result['p95'] - base['p95'] > min_delta:
+            problems.append(
+                f'{name}: p95 {result["p95"]} мс, базовое {base["p95"]} мс')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--driver', choices=DRIVERS, default='client')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Запросов на сценарий')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', default='',
+                        help='Запускать сценарии, содержащие подстроку')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=BASELINES)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--check', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--min-delta', type=float, default=2.0,
+                        help='Рост p95 меньше стольких мс не считается')
+    options = parser.parse_args()
+
+    sample = Sample(options.seed)
+    session_class = DRIVERS[options.driver]
+    server = session_class.start() if options.driver == 'wsgi' else None
+    cache.clear()
+    results = {}
+    print(f'{"сценарий":<40} {"p50":>8} {"p95":>8} {"p99":>8} '
+          f'{"rps":>8} {"ошибки":>7}')
+    for item in scenarios(sample):
+        name = f'{item.method.upper()} {item.name} {item.auth}'
+        if options.only not in name:
+            continue
+        result = results[name] = measure(
+            session_class, item, options.requests, options.concurrency,
+            options.warmup)
+        print(f'{name:<40} {result["p50"]:>8} {result["p95"]:>8} '
+              f'{result["p99"]:>8} {result["rps"]:>8} {result["errors"]:>7}',
+              flush=True)
+    if server is not None:
+        server.shutdown()
+
+    baselines = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline, encoding='utf-8') as source:
+            baselines = json.load(source)
+    key = f'{options.driver}:c{options.concurrency}'
+    if options.save_baseline:
+        baselines[key] = dict(
+            baselines.get(key, {}), **results, data=sample.scale)
+        with open(options.baseline, 'w', encoding='utf-8') as target:
+            json.dump(baselines, target, ensure_ascii=False, indent=2,
+                      sort_keys=True)
+            target.write('\n')
+        print(f'Базовые значения сохранены в {options.baseline} ({key})')
+    if options.check:
+        saved_scale = baselines.get(key, {}).get('data')
+        if saved_scale and any(
+                abs(sample.scale[name] - value) > value * 0.1
+                for name, value in saved_scale.items()):
+            print(f'Внимание: базовые значения сняты на данных {saved_scale}')
+        problems = compare(
+            results, baselines.get(key, {}), options.threshold,
+            options.min_delta)
+        for problem in problems:
+            print(f'РЕГРЕССИЯ {problem}')
+        if problems:
+            sys.exit(1)
+        print('Регрессий нет')
+
+
+if __name__ == '__main__':
+    main()
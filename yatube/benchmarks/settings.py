@@ -0,0 +1,21 @@
+"""
+Настройки для нагрузочных тестов: отдельная база и медиа, режим как
+в рабочем окружении.
+
+    BENCH_DB=/tmp/bench.sqlite3 python benchmarks/generate_data.py
+"""
+import os
+
+from yatube.settings import *  # noqa: F401,F403
+from yatube.settings import BASE_DIR, DATABASES
+
+BENCH_DIR = os.path.join(BASE_DIR, 'benchmarks')
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+DATABASES['default']['NAME'] = os.environ.get(
+    'BENCH_DB', os.path.join(BENCH_DIR, 'bench.sqlite3'))
+MEDIA_ROOT = os.environ.get(
+    'BENCH_MEDIA_ROOT', os.path.join(BENCH_DIR, 'media'))
+IMAGE_PROCESSING = 'sync'
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
@@ -0,0 +1,119 @@
+"""
+Нагрузочный тест SQLite при одновременной записи.
+
+Несколько потоков имитируют запросы «добавить комментарий»: в одной
+транзакции читают число комментариев к посту и вставляют новый, а после
+запроса закрывают соединение так же, как это делает Django по
+``CONN_MAX_AGE``. Сравниваются стандартный бэкенд без переиспользования
+соединений и ``core.db.sqlite3`` с WAL и постоянными соединениями.
+
+    python benchmarks/sqlite_concurrency.py --threads 8 --seconds 5
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import OperationalError  # noqa: E402
+from django.db.utils import ConnectionHandler  # noqa: E402
+
+VARIANTS = {
+    'stock': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'CONN_MAX_AGE': 0,
+    },
+    'tuned': {
+        'ENGINE': 'core.db.sqlite3',
+        'CONN_MAX_AGE': 60,
+    },
+}
+POSTS = 100
+
+
+def prepare(path):
+    handler = ConnectionHandler({'default': {
+        'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}})
+    with handler['default'].cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE comment ('
+            'id INTEGER PRIMARY KEY, post_id INTEGER, text TEXT)')
+        cursor.execute('CREATE INDEX comment_post ON comment (post_id)')
+    handler['default'].close()
+
+
+def request(connection):
+    """Один запрос: чтение и запись в одной транзакции."""
+    post_id = random.randrange(POSTS)
+    connection.ensure_connection()
+    connection._start_transaction_under_autocommit()
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                'SELECT COUNT(*) FROM comment WHERE post_id = %s', [post_id])
+            cursor.fetchone()
+            cursor.execute(
+                'INSERT INTO comment (post_id, text) VALUES (%s, %s)',
+                [post_id, 'x' * 200])
+            cursor.execute('COMMIT')
+        except OperationalError:
+            cursor.execute('ROLLBACK')
+            raise
+    connection.close_if_unusable_or_obsolete()
+
+
+def run(variant, threads, seconds):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'bench.sqlite3')
+    prepare(path)
+    handler = ConnectionHandler(
+        {'default': dict(VARIANTS[variant], NAME=path)})
+    done, locked = [], []
+    deadline = time.monotonic() + seconds
+
+    def worker():
+        connection = handler['default']
+        ok = errors = 0
+        while time.monotonic() < deadline:
+            try:
+                request(connection)
+                ok += 1
+            except OperationalError:
+                errors += 1
+        connection.close()
+        done.append(ok)
+        locked.append(errors)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    shutil.rmtree(directory, ignore_errors=True)
+    return sum(done) / seconds, sum(locked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+    print(f'{"вариант":<8} {"запросов/с":>12} {"database is locked":>20}')
+    for variant in VARIANTS:
+        rps, errors = run(variant, args.threads, args.seconds)
+        print(f'{variant:<8} {rps:>12.1f} {errors:>20}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,10 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .caching import reset_request
+        request_started.connect(reset_request)
@@ -0,0 +1,451 @@
+"""
+Бэкенды общего кеша.
+
+* ``RedisCache`` — минимальный клиент протокола Redis (RESP) без
+  сторонних библиотек: одно соединение на поток.
+* ``ShardedCache`` — распределяет ключи по нескольким узлам любого
+  бэкенда через кольцо консистентного хеширования: при добавлении
+  узла переезжает только часть ключей.
+* ``NearCache`` — локальный кеш процесса с коротким временем жизни
+  перед общим кешем. Запись идёт в общий кеш, ``add`` (блокировки)
+  всегда проверяется там же; чтение другими процессами может
+  отставать не больше чем на ``L1_TIMEOUT`` секунд.
+"""
+import bisect
+import hashlib
+import pickle
+import re
+import socket
+import threading
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.module_loading import import_string
+
+MISSING = object()
+MEMCACHED_KEY_RE = re.compile(r'^[!-~]{1,200}$')
+
+
+def memcached_key(key, key_prefix, version):
+    """
+    Ключ для memcached: длинные ключи и ключи с пробелами или
+    не-ASCII символами (например, со слагом группы) заменяются хешем.
+    """
+    key = f'{key_prefix}:{version}:{key}'
+    if MEMCACHED_KEY_RE.match(key):
+        return key
+    return f'{key_prefix}:{version}:md5:' + hashlib.md5(
+        key.encode()).hexdigest()
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """Соединение с одним сервером Redis и разбор ответов RESP."""
+
+    def __init__(self, host, port, db=0, timeout=1.0):
+        self.address = (host, port)
+        self.db = db
+        self.timeout = timeout
+        self.sock = None
+        self.reader = None
+
+    def connect(self):
+        self.sock = socket.create_connection(self.address, self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        if self.db:
+            self.execute('SELECT', self.db)
+
+    def close(self):
+        if self.sock is not None:
+            self.reader.close()
+            self.sock.close()
+        self.sock = self.reader = None
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def pipeline(self, commands):
+        """Отправляет команды одним пакетом и читает все ответы."""
+        if self.sock is None:
+            self.connect()
+        try:
+            self.sock.sendall(b''.join(
+                self.encode(command) for command in commands))
+            replies = [self.read_reply() for _ in commands]
+        except OSError:
+            self.close()
+            raise
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    @staticmethod
+    def encode(command):
+        parts = [b'*%d\r\n' % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Соединение с Redis закрыто')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            return RedisError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            return self.reader.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self.read_reply() for _ in range(length)]
+        raise RedisError(f'Неизвестный ответ: {line!r}')
+
+
+class RedisCache(BaseCache):
+    """
+    Кеш в Redis. ``LOCATION`` — ``host:port``, номер базы задаётся
+    в ``OPTIONS['DB']``. Целые числа хранятся как есть, чтобы работал
+    ``INCRBY``, остальное — через pickle.
+    """
+
+    def __init__(self, server, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.db = options.pop('DB', 0)
+        self.socket_timeout = options.pop('SOCKET_TIMEOUT', 1.0)
+        params = dict(params, OPTIONS=options)
+        super().__init__(params)
+        host, _, port = server.rpartition(':')
+        self.host, self.port = host or 'localhost', int(port or 6379)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = RedisConnection(
+                self.host, self.port, self.db, self.socket_timeout)
+        return connection
+
+    def _execute(self, *args):
+        try:
+            return self.connection.execute(*args)
+        except OSError:
+            return self.connection.execute(*args)
+
+    @staticmethod
+    def encode(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def decode(data):
+        if data.startswith(b'\x80'):
+            return pickle.loads(data)
+        return int(data)
+
+    def _expiry(self, timeout):
+        """Аргументы времени жизни для SET или ``None``, если не хранить."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return []
+        if timeout <= 0:
+            return None
+        return ['PX', int(timeout * 1000)]
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            return False
+        return self._execute(
+            'SET', self._key(key, version), self.encode(value),
+            *expiry, 'NX') is not None
+
+    def get(self, key, default=None, version=None):
+        data = self._execute('GET', self._key(key, version))
+        return default if data is None else self.decode(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            self._execute('DEL', key)
+            return
+        self._execute('SET', key, self.encode(value), *expiry)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            return bool(self._execute('DEL', key))
+        if not expiry:
+            return bool(self._execute('PERSIST', key)) or self.has_key(key)
+        return bool(self._execute('PEXPIRE', key, expiry[1]))
+
+    def delete(self, key, version=None):
+        self._execute('DEL', self._key(key, version))
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._execute(
+            'MGET', *(self._key(key, version) for key in keys))
+        return {
+            key: self.decode(data)
+            for key, data in zip(keys, values) if data is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry(timeout)
+        if not data:
+            return []
+        if expiry is None:
+            self.delete_many(data, version)
+            return []
+        self.connection.pipeline([
+            ('SET', self._key(key, version), self.encode(value), *expiry)
+            for key, value in data.items()
+        ])
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._execute('DEL', *keys)
+
+    def has_key(self, key, version=None):
+        return bool(self._execute('EXISTS', self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        if not self.has_key(key, version):
+            raise ValueError(f"Key '{key}' not found")
+        return self._execute('INCRBY', self._key(key, version), delta)
+
+    def clear(self):
+        self._execute('FLUSHDB')
+
+    def close(self, **kwargs):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+
+
+class HashRing:
+    """Кольцо консистентного хеширования с виртуальными узлами."""
+
+    def __init__(self, nodes, replicas=64):
+        self.ring = sorted(
+            (self.hash(f'{node}#{number}'), node)
+            for node in nodes for number in range(replicas)
+        )
+        self.hashes = [point for point, _ in self.ring]
+
+    @staticmethod
+    def hash(value):
+        return int(hashlib.md5(value.encode()).hexdigest()[:16], 16)
+
+    def node(self, key):
+        position = bisect.bisect(self.hashes, self.hash(key))
+        return self.ring[position % len(self.ring)][1]
+
+
+class ShardedCache(BaseCache):
+    """
+    Несколько узлов одного бэкенда. ``LOCATION`` — список адресов,
+    ``OPTIONS['NODE_BACKEND']`` — бэкенд узла, ``OPTIONS['NODE_OPTIONS']``
+    передаются каждому узлу.
+    """
+
+    def __init__(self, servers, params):
+        options = dict(params.get('OPTIONS', {}))
+        backend = import_string(options.pop('NODE_BACKEND'))
+        node_options = options.pop('NODE_OPTIONS', {})
+        replicas = options.pop('REPLICAS', 64)
+        super().__init__(dict(params, OPTIONS=options))
+        if isinstance(servers, str):
+            servers = servers.split(',')
+        node_params = {
+            name: params[name]
+            for name in ('TIMEOUT', 'KEY_PREFIX', 'VERSION', 'KEY_FUNCTION')
+            if name in params
+        }
+        self.nodes = {
+            server: backend(server, dict(node_params, OPTIONS=node_options))
+            for server in servers
+        }
+        self.ring = HashRing(self.nodes, replicas)
+
+    def node_for(self, key):
+        return self.nodes[self.ring.node(str(key))]
+
+    def _group(self, keys):
+        groups = {}
+        for key in keys:
+            groups.setdefault(self.ring.node(str(key)), []).append(key)
+        return groups.items()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.node_for(key).add(key, value, timeout, version)
+
+    def get(self, key, default=None, version=None):
+        return self.node_for(key).get(key, default, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.node_for(key).set(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.node_for(key).touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.node_for(key).delete(key, version)
+
+    def has_key(self, key, version=None):
+        return self.node_for(key).has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.node_for(key).incr(key, delta, version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        for server, group in self._group(keys):
+            found.update(self.nodes[server].get_many(group, version))
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = []
+        for server, group in self._group(data):
+            failed.extend(self.nodes[server].set_many(
+                {key: data[key] for key in group}, timeout, version))
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for server, group in self._group(keys):
+            self.nodes[server].delete_many(group, version)
+
+    def clear(self):
+        for node in self.nodes.values():
+            node.clear()
+
+    def close(self, **kwargs):
+        for node in self.nodes.values():
+            node.close(**kwargs)
+
+
+class NearCache(BaseCache):
+    """
+    Локальный кеш процесса перед общим кешем ``OPTIONS['TARGET']``.
+
+    ``OPTIONS['L1_TIMEOUT']`` ограничивает, как долго значение живёт
+    локально, ``OPTIONS['L1_MAX_ENTRIES']`` — сколько значений хранится.
+    """
+
+    def __init__(self, name, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.target_alias = options.pop('TARGET')
+        self.l1_timeout = options.pop('L1_TIMEOUT', 2)
+        max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        super().__init__(dict(params, OPTIONS=options))
+        self.local = LocMemCache(f'near:{name}:{self.target_alias}', {
+            'TIMEOUT': self.l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': max_entries},
+        })
+
+    @property
+    def target(self):
+        return caches[self.target_alias]
+
+    def _remember(self, key, value, version):
+        self.local.set(key, value, self.l1_timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.target.add(key, value, timeout, version)
+        if added:
+            self._remember(key, value, version)
+        else:
+            self.local.delete(key, version)
+        return added
+
+    def get(self, key, default=None, version=None):
+        value = self.local.get(key, MISSING, version)
+        if value is not MISSING:
+            return value
+        value = self.target.get(key, MISSING, version)
+        if value is MISSING:
+            return default
+        self._remember(key, value, version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.target.set(key, value, timeout, version)
+        self._remember(key, value, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.target.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.target.delete(key, version)
+        self.local.delete(key, version)
+
+    def has_key(self, key, version=None):
+        return (self.local.has_key(key, version)
+                or self.target.has_key(key, version))
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(key, version)
+        return self.target.incr(key, delta, version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key, MISSING, version)
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = self.target.get_many(missing, version)
+            for key, value in fetched.items():
+                self._remember(key, value, version)
+            found.update(fetched)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.target.set_many(data, timeout, version)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(key, value, version)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.target.delete_many(keys, version)
+        self.local.delete_many(keys, version)
+
+    def clear(self):
+        self.target.clear()
+        self.local.clear()
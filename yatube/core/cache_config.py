@@ -0,0 +1,72 @@
+"""
+Настройка ``CACHES`` из строки подключения.
+
+Модуль импортируется из settings, поэтому не обращается к Django.
+
+* пустая строка — локальный кеш процесса;
+* ``file:///var/tmp/yatube`` — файловый кеш;
+* ``memcached://10.0.0.1:11211,10.0.0.2:11211`` — memcached;
+* ``redis://10.0.0.1:6379,10.0.0.2:6379/1`` — Redis, база 1.
+
+Несколько адресов распределяются по кольцу консистентного хеширования.
+Для общего кеша ``default`` становится локальным кешем перед ним
+с временем жизни ``l1_timeout`` секунд, а сам общий кеш доступен
+как ``shared``.
+"""
+from urllib.parse import urlsplit
+
+NODE_BACKENDS = {
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'redis': 'core.cache_backends.RedisCache',
+}
+
+
+def caches_from_url(url, l1_timeout=0):
+    if not url:
+        return {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            }
+        }
+    parts = urlsplit(url)
+    if parts.scheme == 'file':
+        return {
+            'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': parts.path,
+            }
+        }
+    if parts.scheme not in NODE_BACKENDS:
+        raise ValueError(f'Неизвестный кеш: {url}')
+
+    servers = parts.netloc.split(',')
+    options = {}
+    if parts.scheme == 'redis' and parts.path.strip('/'):
+        options['DB'] = int(parts.path.strip('/'))
+    if len(servers) == 1:
+        shared = {
+            'BACKEND': NODE_BACKENDS[parts.scheme],
+            'LOCATION': servers[0],
+            'OPTIONS': options,
+        }
+    else:
+        shared = {
+            'BACKEND': 'core.cache_backends.ShardedCache',
+            'LOCATION': servers,
+            'OPTIONS': {
+                'NODE_BACKEND': NODE_BACKENDS[parts.scheme],
+                'NODE_OPTIONS': options,
+            },
+        }
+    if parts.scheme == 'memcached':
+        shared['KEY_FUNCTION'] = 'core.cache_backends.memcached_key'
+    if not l1_timeout:
+        return {'default': shared}
+    return {
+        'default': {
+            'BACKEND': 'core.cache_backends.NearCache',
+            'OPTIONS': {'TARGET': 'shared', 'L1_TIMEOUT': l1_timeout},
+        },
+        'shared': shared,
+    }
@@ -0,0 +1,212 @@
+"""
+Версионированные ключи кеша и защита от лавины пересчётов.
+
+Фрагменты страниц кешируются надолго, а в ключ добавляется версия
+области данных (лента, группа, автор, пост). При изменении данных
+сигналы моделей меняют версию, и старые фрагменты просто перестают
+запрашиваться. Пересчёт значений идёт через ``get_or_compute``.
+
+Если запрос получил значение прошлой версии (пересчёт держит другой
+процесс), всё, что он собирает дальше, тоже устарело: такие значения
+отдаются, но не сохраняются под ключами новых версий.
+
+Пересчёт читает с реплик. Если версия области сменилась меньше
+``REPLICA_PIN_SECONDS`` назад, реплика могла ещё не получить изменение,
+поэтому прочитанное с неё значение хранится только до конца этого окна
+(``cache_timeout``).
+"""
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import db_router
+
+logger = logging.getLogger(__name__)
+
+
+def version_key(scope):
+    """
+    Ключ версии области. Части экранируются, чтобы слаги с пробелами и
+    не-ASCII символами давали ключ, допустимый для memcached.
+    """
+    return 'version:' + ':'.join(quote(str(part), safe='') for part in scope)
+
+
+def new_version():
+    return format(time.time_ns(), 'x')
+
+
+def version_time(version):
+    """Время смены версии в секундах; версии — это ``time_ns`` в hex."""
+    try:
+        return int(version, 16) / 10 ** 9
+    except (TypeError, ValueError):
+        return 0
+
+
+def get_version(*scopes):
+    """Строка версий для набора областей, например ``('group', slug)``."""
+    keys = [version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = new_version()
+            cache.add(key, version, None)
+            versions[key] = cache.get(key) or version
+    note_versions(versions.values())
+    return '.'.join(versions[key] for key in keys)
+
+
+def bump_version(*scopes):
+    """Делает устаревшими все фрагменты, зависящие от этих областей."""
+    cache.set_many(
+        {version_key(scope): new_version() for scope in scopes}, None)
+
+
+class CacheMetrics:
+    """Счётчики попаданий, промахов и пересчётов по именам кешей."""
+    EVENTS = ('hit', 'miss', 'stale', 'recompute', 'wait')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = defaultdict(Counter)
+            self._compute_time = Counter()
+
+    def record(self, name, event, duration=None):
+        with self._lock:
+            self._counters[name][event] += 1
+            if duration is not None:
+                self._compute_time[name] += duration
+        logger.debug('cache %s: %s', name, event)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: dict(
+                    {event: counter[event] for event in self.EVENTS},
+                    compute_time=round(self._compute_time[name], 6)
+                )
+                for name, counter in self._counters.items()
+            }
+
+
+metrics = CacheMetrics()
+
+_request = threading.local()
+
+
+def mark_stale():
+    _request.stale = True
+
+
+def served_stale():
+    """Отдавалось ли в текущем запросе значение прошлой версии."""
+    return getattr(_request, 'stale', False)
+
+
+def note_versions(versions):
+    newest = max(map(version_time, versions), default=0)
+    _request.newest_version = max(
+        newest, getattr(_request, 'newest_version', 0))
+
+
+def cache_timeout(timeout):
+    """
+    Срок хранения значения, собранного в текущем запросе.
+
+    Значение, прочитанное с реплики вскоре после смены одной из версий
+    запроса, живёт только до конца окна ``REPLICA_PIN_SECONDS``.
+    """
+    if not settings.DATABASE_REPLICAS or db_router.is_pinned():
+        return timeout
+    age = time.time() - getattr(_request, 'newest_version', 0)
+    if age >= settings.REPLICA_PIN_SECONDS:
+        return timeout
+    return min(timeout, math.ceil(settings.REPLICA_PIN_SECONDS - age))
+
+
+def reset_request(**kwargs):
+    _request.stale = False
+    _request.newest_version = 0
+
+
+def get_or_compute(name, key, compute, timeout, stale_key=None):
+    """
+    Значение из кеша с защитой от лавины пересчётов.
+
+    * Пересчёт выполняет только тот процесс, который взял блокировку
+      ``lock:<key>``; остальные отдают устаревшее значение или недолго
+      ждут свежего.
+    * Вероятностное раннее истечение (XFetch): чем дороже пересчёт,
+      тем раньше до срока один из запросов обновит значение.
+    * ``stale_key`` хранит последнее значение без учёта версии, чтобы
+      после смены версии было что отдать, пока идёт пересчёт.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires_at, delta = entry
+        jitter = delta * settings.CACHE_EARLY_EXPIRY_BETA * math.log(
+            1 - random.random())
+        if time.time() - jitter < expires_at:
+            metrics.record(name, 'hit')
+            return value
+        if not _acquire(key):
+            metrics.record(name, 'stale')
+            return value
+        return _recompute(name, key, compute, timeout, stale_key)
+
+    metrics.record(name, 'miss')
+    if _acquire(key):
+        return _recompute(name, key, compute, timeout, stale_key)
+    if stale_key is not None:
+        stale = cache.get(stale_key)
+        if stale is not None:
+            metrics.record(name, 'stale')
+            mark_stale()
+            return stale
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(settings.CACHE_LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            metrics.record(name, 'wait')
+            return entry[0]
+    return _recompute(name, key, compute, timeout, stale_key, locked=False)
+
+
+def _lock_key(key):
+    return f'lock:{key}'
+
+
+def _acquire(key):
+    return cache.add(_lock_key(key), 1, settings.CACHE_LOCK_TIMEOUT)
+
+
+def _recompute(name, key, compute, timeout, stale_key, locked=True):
+    timeout = cache_timeout(timeout)
+    started = time.monotonic()
+    try:
+        value = compute()
+        delta = time.monotonic() - started
+        metrics.record(name, 'recompute', delta)
+        if served_stale():
+            return value
+        lifetime = timeout + settings.CACHE_STALE_TIMEOUT
+        cache.set(key, (value, time.time() + timeout, delta), lifetime)
+        if stale_key is not None:
+            cache.set(stale_key, value, lifetime)
+    finally:
+        if locked:
+            cache.delete(_lock_key(key))
+    return value
@@ -0,0 +1,74 @@
+"""
+Условные GET-запросы по версиям кеша.
+
+Валидаторы страницы строятся из тех же версий областей данных, что и
+ключи фрагментного кеша (см. ``core.caching``), поэтому проверка
+``If-None-Match``/``If-Modified-Since`` стоит одного обращения к кешу:
+неизменившаяся страница отдаётся с кодом 304 без запросов к базе для
+ленты и без рендеринга шаблона.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from .caching import get_version
+
+
+def _versions(request, scopes_func, user_scopes, args, kwargs):
+    if not hasattr(request, '_page_versions'):
+        scopes = scopes_func(request, *args, **kwargs)
+        if scopes is not None and request.user.is_authenticated:
+            scopes = list(scopes) + list(user_scopes(request.user))
+        request._page_versions = (
+            None if scopes is None else get_version(*scopes))
+    return request._page_versions
+
+
+def conditional_on_versions(scopes_func, user_scopes=lambda user: ()):
+    """
+    Добавляет к представлению ETag и Last-Modified.
+
+    ``scopes_func(request, *args, **kwargs)`` возвращает области, от
+    которых зависит общая для всех часть страницы, или ``None``, если
+    страницы нет; ``user_scopes(user)`` — области персональных частей.
+    ETag учитывает пользователя и CSRF-cookie, поэтому анонимный и личный
+    варианты страницы не смешиваются; ответы помечаются ``Vary: Cookie``.
+    Last-Modified отдаётся только анонимам: по дате нельзя отличить
+    вход под другим пользователем.
+
+    ``scopes_func`` сохраняется в ``version_scopes`` представления для
+    кеша целых страниц.
+    """
+    def etag(request, *args, **kwargs):
+        versions = _versions(
+            request, scopes_func, user_scopes, args, kwargs)
+        if versions is None:
+            return None
+        user = request.user.pk if request.user.is_authenticated else 'anon'
+        raw = '|'.join(str(part) for part in (
+            request.resolver_match.view_name, versions, user,
+            request.get_full_path(),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        versions = _versions(
+            request, scopes_func, user_scopes, args, kwargs)
+        if versions is None:
+            return None
+        latest = max(int(version, 16) for version in versions.split('.'))
+        return datetime.fromtimestamp(latest / 1e9, tz=timezone.utc)
+
+    def decorator(view):
+        wrapped = vary_on_cookie(
+            condition(etag_func=etag, last_modified_func=last_modified)(view)
+        )
+        wrapped.version_scopes = scopes_func
+        return wrapped
+    return decorator
@@ -0,0 +1,45 @@
+"""
+SQLite для боевой нагрузки.
+
+Тот же бэкенд Django, но каждое новое соединение переводится в режим
+WAL и получает настройки ``PRAGMAS`` (их можно дополнить через
+``OPTIONS['pragmas']``), а транзакции открываются как
+``BEGIN IMMEDIATE``: блокировка на запись берётся сразу и ждёт
+``busy_timeout``, вместо ``database is locked`` при попытке повысить
+блокировку внутри уже начатой транзакции. Соединения переиспользуются
+между запросами через обычный ``CONN_MAX_AGE``.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = dict(PRAGMAS, **params.pop('pragmas', {}))
+        self.transaction_mode = params.pop(
+            'transaction_mode', 'IMMEDIATE').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ValueError(
+                f'Неизвестный режим транзакций: {self.transaction_mode}')
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if name == 'journal_mode' and self.is_in_memory_db():
+                continue
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
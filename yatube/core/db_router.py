@@ -0,0 +1,56 @@
+"""
+Чтение с реплик и запись в основную базу.
+
+Реплики перечислены в ``settings.DATABASE_REPLICAS``. Запросы на чтение
+уходят на случайную реплику, пока в текущем запросе не было записи.
+После записи чтение до конца запроса идёт из основной базы, а
+``ReplicaPinMiddleware`` ставит cookie, по которой следующие запросы
+этого пользователя ещё ``REPLICA_PIN_SECONDS`` секунд читают оттуда же:
+автор сразу видит свой пост, даже если реплика отстаёт.
+
+Значения, прочитанные с реплики сразу после смены версии кеша,
+хранятся недолго (см. ``core.caching.cache_timeout``).
+"""
+import random
+import threading
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_state = threading.local()
+
+
+def pin_to_primary():
+    _state.pinned = True
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def has_written():
+    return getattr(_state, 'written', False)
+
+
+def reset(pinned=False):
+    _state.pinned = pinned
+    _state.written = False
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if is_pinned() or not settings.DATABASE_REPLICAS:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _state.written = True
+        pin_to_primary()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+from . import db_router, page_cache
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaPinMiddleware:
+    """Читает из основной базы после записи этого же пользователя."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.reset(
+            pinned=request.method not in SAFE_METHODS
+            or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        try:
+            response = self.get_response(request)
+            if db_router.has_written():
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True, samesite='Lax'
+                )
+        finally:
+            db_router.reset()
+        return response
+
+
+def is_anonymous(request):
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Отдаёт анонимам готовую страницу до сессий, аутентификации и шаблонов.
+
+    Ставится перед ``SessionMiddleware``; ключ страницы запоминается в
+    ``request.page_cache_key`` для ``PageHoleMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.page_cache_key = page_cache.page_key(request)
+        anonymous = key is not None and is_anonymous(request)
+        if anonymous:
+            page = page_cache.load(key)
+            if page is not None:
+                response = page_cache.build_response(page)
+                return get_conditional_response(
+                    request, etag=response.get('ETag'),
+                    last_modified=parse_http_date_safe(
+                        response.get('Last-Modified', '')),
+                    response=response
+                )
+        response = self.get_response(request)
+        if anonymous:
+            page_cache.store(key, response)
+        return response
+
+
+class PageHoleMiddleware:
+    """Заполняет персональные части закешированной страницы."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = getattr(request, 'page_cache_key', None)
+        revalidating = (
+            'HTTP_IF_NONE_MATCH' in request.META
+            or 'HTTP_IF_MODIFIED_SINCE' in request.META
+        )
+        if key is not None and not revalidating:
+            page = page_cache.load(key)
+            if page is not None:
+                response = page_cache.build_response(page, request)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+        return self.get_response(request)
@@ -0,0 +1,97 @@
+"""
+Кеш целых страниц для анонимных читателей.
+
+Страница, отрисованная для анонима, хранится целиком под ключом из
+пути с параметрами и версий областей данных представления (их задаёт
+``conditional_on_versions``). Части, зависящие от пользователя, в
+шаблонах помечены тегом ``{% hole %}``: в сохранённой странице они
+обёрнуты в комментарии-маркеры, и для вошедшего пользователя
+перерисовываются только эти небольшие шаблоны.
+"""
+import base64
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve
+
+from .caching import cache_timeout, get_version, served_stale
+
+HOLE_MARK = '<!--hole '
+HOLE_RE = re.compile(r'<!--hole (?P<meta>[\w=-]*)-->.*?<!--/hole-->', re.S)
+SKIPPED_HEADERS = ('set-cookie', 'content-length')
+
+
+def mark_hole(template_name, values, html):
+    meta = base64.urlsafe_b64encode(
+        json.dumps([template_name, values]).encode()).decode()
+    return f'<!--hole {meta}-->{html}<!--/hole-->'
+
+
+def fill_holes(content, request, keep_marks=False):
+    """
+    Перерисовывает помеченные части страницы для пользователя запроса.
+
+    С ``keep_marks`` метки остаются, чтобы страницу, собранную из
+    закешированных фрагментов, можно было снова сохранить целиком.
+    """
+    def render_hole(match):
+        template_name, values = json.loads(
+            base64.urlsafe_b64decode(match.group('meta')))
+        html = render_to_string(template_name, values, request=request)
+        if keep_marks:
+            return mark_hole(template_name, values, html)
+        return html
+    return HOLE_RE.sub(render_hole, content)
+
+
+def page_key(request):
+    """Ключ страницы или ``None``, если страницу не кешируем."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    scopes_func = getattr(match.func, 'version_scopes', None)
+    if scopes_func is None or match.view_name not in settings.PAGE_CACHE_VIEWS:
+        return None
+    scopes = scopes_func(request, *match.args, **match.kwargs)
+    if scopes is None:
+        return None
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{path}:{get_version(*scopes)}'
+
+
+def store(key, response):
+    if served_stale():
+        return
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return
+    headers = [
+        (name, value) for name, value in response.items()
+        if name.lower() not in SKIPPED_HEADERS
+    ]
+    cache.set(
+        key, (response.content.decode(response.charset), headers),
+        cache_timeout(settings.PAGE_CACHE_TIMEOUT)
+    )
+
+
+def load(key):
+    return cache.get(key)
+
+
+def build_response(page, request=None):
+    content, headers = page
+    if request is not None:
+        content = fill_holes(content, request)
+    response = HttpResponse(content)
+    for name, value in headers:
+        if request is None or name.lower() not in ('etag', 'last-modified'):
+            response[name] = value
+    return response
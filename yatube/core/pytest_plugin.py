@@ -0,0 +1,45 @@
+"""
+Плагин pytest: бюджеты запросов из ``QUERY_BUDGETS`` роняют тесты.
+
+Подключается в ``conftest.py``::
+
+    pytest_plugins = ['core.pytest_plugin']
+
+Фикстура ``query_stats`` собирает статистику запросов внутри теста
+для явных проверок, в конце прогона печатается наибольшее число
+запросов по каждому представлению.
+"""
+from collections import defaultdict
+
+import pytest
+
+from . import query_budget
+
+observed = defaultdict(int)
+
+
+@pytest.fixture(autouse=True)
+def _strict_query_budgets(settings, monkeypatch):
+    settings.QUERY_BUDGET_STRICT = True
+    problems = query_budget.RequestStats.problems
+
+    def record(stats, view_name):
+        observed[view_name] = max(observed[view_name], stats.count)
+        return problems(stats, view_name)
+    monkeypatch.setattr(query_budget.RequestStats, 'problems', record)
+
+
+@pytest.fixture
+def query_stats():
+    with query_budget.collect() as stats:
+        yield stats
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not observed:
+        return
+    from django.conf import settings
+    terminalreporter.section('query budgets')
+    for view_name, count in sorted(observed.items()):
+        budget = settings.QUERY_BUDGETS.get(view_name, '-')
+        terminalreporter.write_line(f'{view_name}: {count} / {budget}')
@@ -0,0 +1,154 @@
+"""
+Учёт запросов к базе и времени шаблонов на каждый запрос.
+
+``QueryBudgetMiddleware`` собирает для запроса число SQL-запросов, их
+суммарное время, повторяющиеся формы запросов (признак N+1) и время
+рендеринга шаблонов. Данные уходят в заголовки ``Server-Timing`` и
+``X-Query-*`` и в строку лога ``core.query_budget``.
+
+``QUERY_BUDGETS`` задаёт допустимое число запросов для имени URL, а
+``QUERY_REPEAT_LIMIT`` — сколько раз в таком представлении может
+повториться одна форма запроса. В рабочем режиме превышение пишется
+в лог предупреждением, в тестах (``QUERY_BUDGET_STRICT``) — роняет тест.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDERS_RE = re.compile(r'\(%s(?:, %s)*\)')
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_shape(sql):
+    """Текст запроса без параметров; списки ``IN (...)`` схлопываются."""
+    return PLACEHOLDERS_RE.sub('(%s...)', sql)
+
+
+class RequestStats:
+    def __init__(self):
+        self.count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.shapes = Counter()
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    @property
+    def repeated(self):
+        """Формы запросов, выполненные больше одного раза, и их число."""
+        return {
+            shape: count for shape, count in self.shapes.most_common()
+            if count > 1
+        }
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.repeated.values())
+
+    def server_timing(self):
+        return (
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.count} queries", '
+            f'tpl;dur={self.template_time * 1000:.1f}'
+        )
+
+    def problems(self, view_name):
+        """Описания превышений бюджета для представления."""
+        budget = settings.QUERY_BUDGETS.get(view_name)
+        if budget is None:
+            return []
+        found = []
+        if self.count > budget:
+            found.append(
+                f'{view_name}: {self.count} запросов при бюджете {budget}')
+        for shape, count in self.repeated.items():
+            if count > settings.QUERY_REPEAT_LIMIT:
+                found.append(
+                    f'{view_name}: запрос выполнен {count} раз: {shape}')
+        return found
+
+
+def current():
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def collect():
+    """Собирает статистику запросов всех баз в пределах блока."""
+    stats = RequestStats()
+    previous = current()
+    _local.stats = stats
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield stats
+    finally:
+        _local.stats = previous
+
+
+@contextmanager
+def template_timer():
+    """Учитывает время внешнего рендеринга; вложенные не суммируются."""
+    stats = current()
+    if stats is None:
+        yield
+        return
+    stats._template_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats._template_depth -= 1
+        if not stats._template_depth:
+            stats.template_time += time.perf_counter() - start
+
+
+class QueryBudgetMiddleware:
+    """Ставится первым, чтобы учесть запросы всех остальных слоёв."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect() as stats:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '-'
+        if settings.QUERY_STATS_HEADERS:
+            response['Server-Timing'] = stats.server_timing()
+            response['X-Query-Count'] = stats.count
+            response['X-Query-Duplicates'] = stats.duplicates
+        logger.info(
+            '%s %s %s status=%s queries=%d sql=%.1fms duplicates=%d '
+            'templates=%.1fms',
+            request.method, request.path, view_name, response.status_code,
+            stats.count, stats.sql_time * 1000, stats.duplicates,
+            stats.template_time * 1000
+        )
+        problems = stats.problems(view_name)
+        if problems and settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded('\n'.join(problems))
+        for problem in problems:
+            logger.warning(problem)
+        return response
@@ -0,0 +1,123 @@
+"""
+Стеммер русского языка по алгоритму Snowball.
+
+Нужен для полнотекстового поиска на SQLite, где FTS5 не умеет
+приводить русские слова к основе: основы считаются здесь и
+для индексируемого текста, и для запроса.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', True), ('вши', True), ('вшись', True),
+    ('ив', False), ('ивши', False), ('ившись', False),
+    ('ыв', False), ('ывши', False), ('ывшись', False),
+)
+ADJECTIVE = tuple((ending, False) for ending in (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', True), ('нн', True), ('вш', True), ('ющ', True), ('щ', True),
+    ('ивш', False), ('ывш', False), ('ующ', False),
+)
+REFLEXIVE = (('ся', False), ('сь', False))
+VERB = tuple((ending, True) for ending in (
+    'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+    'ют', 'ны', 'ть', 'ешь', 'нно',
+)) + tuple((ending, False) for ending in (
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+    'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+    'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+))
+NOUN = tuple((ending, False) for ending in (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+))
+DERIVATIONAL = (('ост', False), ('ость', False))
+SUPERLATIVE = (('ейш', False), ('ейше', False))
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _by_length(endings):
+    return sorted(endings, key=lambda item: -len(item[0]))
+
+
+PERFECTIVE_GERUND, ADJECTIVE, PARTICIPLE, REFLEXIVE, VERB, NOUN = map(
+    _by_length,
+    (PERFECTIVE_GERUND, ADJECTIVE, PARTICIPLE, REFLEXIVE, VERB, NOUN)
+)
+DERIVATIONAL, SUPERLATIVE = map(_by_length, (DERIVATIONAL, SUPERLATIVE))
+
+
+def _region(word, start):
+    """Позиция после первой согласной, следующей за гласной."""
+    for position in range(start + 1, len(word)):
+        if word[position] not in VOWELS and word[position - 1] in VOWELS:
+            return position + 1
+    return len(word)
+
+
+def _strip(word, endings, limit):
+    """
+    Отрезает самое длинное окончание из ``endings`` в пределах ``limit``.
+
+    Окончания с флагом должны идти после «а» или «я». Возвращает
+    ``None``, если окончание не найдено или условие не выполнено.
+    """
+    for ending, after_a in endings:
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if len(stem) < limit:
+            continue
+        if after_a and (len(stem) <= limit or stem[-1] not in 'ая'):
+            return None
+        return stem
+    return None
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (position + 1 for position, letter in enumerate(word)
+         if letter in VOWELS),
+        len(word)
+    )
+    r2 = _region(word, _region(word, 0))
+
+    stripped = _strip(word, PERFECTIVE_GERUND, rv)
+    if stripped is None:
+        word = _strip(word, REFLEXIVE, rv) or word
+        stripped = _strip(word, ADJECTIVE, rv)
+        if stripped is not None:
+            stripped = _strip(stripped, PARTICIPLE, rv) or stripped
+        else:
+            stripped = _strip(word, VERB, rv) or _strip(word, NOUN, rv)
+    word = stripped or word
+
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _strip(word, DERIVATIONAL, r2) or word
+
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        return word[:-1]
+    superlative = _strip(word, SUPERLATIVE, rv)
+    if superlative is not None:
+        word = superlative
+        if word.endswith('нн') and len(word) - 1 >= rv:
+            word = word[:-1]
+        return word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def stem_words(text):
+    """Основы всех слов текста в исходном порядке."""
+    return [stem(word) for word in WORD_RE.findall(text)]
@@ -0,0 +1,62 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.safestring import mark_safe
+
+from core.caching import get_or_compute
+from core.page_cache import HOLE_MARK, fill_holes
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, name, version, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.version = version
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = int(self.timeout.resolve(context))
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        stale_key = make_template_fragment_key(self.name, vary_on)
+        key = stale_key
+        if self.version is not None:
+            version = self.version.resolve(context)
+            key = make_template_fragment_key(self.name, [version] + vary_on)
+        html = get_or_compute(
+            self.name, key, lambda: self.nodelist.render(context), timeout,
+            stale_key=stale_key if key != stale_key else None
+        )
+        request = context.get('request')
+        if request is not None and HOLE_MARK in html:
+            html = mark_safe(fill_holes(html, request, keep_marks=True))
+        return html
+
+
+@register.tag('cache_fragment')
+def do_cache_fragment(parser, token):
+    """
+    Аналог ``{% cache %}`` с защитой от лавины пересчётов::
+
+        {% cache_fragment timeout name version=cache_version [vary ...] %}
+
+    Пока один запрос пересчитывает фрагмент новой версии, остальные
+    получают предыдущую версию фрагмента. Части, помеченные
+    ``{% hole %}``, перерисовываются для пользователя запроса.
+    """
+    nodelist = parser.parse(('endcache_fragment',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} принимает как минимум два аргумента')
+    version = None
+    vary_on = []
+    for bit in bits[3:]:
+        if bit.startswith('version='):
+            version = parser.compile_filter(bit[len('version='):])
+        else:
+            vary_on.append(parser.compile_filter(bit))
+    return FragmentCacheNode(
+        nodelist, parser.compile_filter(bits[1]), bits[2], version, vary_on)
@@ -0,0 +1,44 @@
+from django import template
+from django.template.base import token_kwargs
+
+from ..page_cache import mark_hole
+
+register = template.Library()
+
+
+class HoleNode(template.Node):
+    def __init__(self, template_name, kwargs):
+        self.template_name = template_name
+        self.kwargs = kwargs
+
+    def render(self, context):
+        template_name = self.template_name.resolve(context)
+        values = {
+            name: value.resolve(context)
+            for name, value in self.kwargs.items()
+        }
+        with context.push(**values):
+            html = context.template.engine.get_template(
+                template_name).render(context)
+        return mark_hole(template_name, values, html)
+
+
+@register.tag
+def hole(parser, token):
+    """
+    ``{% hole 'includes/follow_button.html' username=author.username %}``
+
+    Вставляет шаблон, зависящий от пользователя. В кеше целых страниц
+    он помечается и перерисовывается для каждого вошедшего читателя,
+    поэтому получает только переданные здесь значения (строки и числа)
+    и данные контекстных процессоров.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' ожидает имя шаблона")
+    kwargs = token_kwargs(bits[2:], parser)
+    if len(kwargs) != len(bits) - 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает только именованные аргументы")
+    return HoleNode(parser.compile_filter(bits[1]), kwargs)
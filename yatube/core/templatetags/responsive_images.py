@@ -0,0 +1,48 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 992px) 100vw, 960px'
+
+
+def srcset(items):
+    return ', '.join(f'{url} {width}w' for url, width in items)
+
+
+@register.simple_tag
+def responsive_image(renditions, name, eager=False, sizes=DEFAULT_SIZES,
+                     alt='', css='card-img my-2'):
+    """
+    Разметка ``<picture>`` со ``srcset`` из готовых копий изображения.
+
+    Берутся копии ``name`` и ``name_<ширина>``; адреса и размеры читаются
+    из сохранённых метаданных, к хранилищу тег не обращается. Все
+    изображения, кроме ``eager``, загружаются лениво.
+    """
+    variants = sorted(
+        (
+            rendition for key, rendition in renditions.items()
+            if key == name or key.startswith(name + '_')
+        ),
+        key=lambda rendition: rendition.width
+    )
+    if not variants:
+        return ''
+    default = renditions.get(name, variants[-1])
+    by_type = {}
+    for rendition in variants:
+        for mime, url in rendition.sources.items():
+            by_type.setdefault(mime, []).append((url, rendition.width))
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, srcset(items), sizes) for mime, items in by_type.items())
+    )
+    return format_html(
+        '<picture>{}<img class="{}" src="{}" srcset="{}" sizes="{}" '
+        'width="{}" height="{}" alt="{}" decoding="async"{}></picture>',
+        sources, css, default.url,
+        srcset((rendition.url, rendition.width) for rendition in variants),
+        sizes, default.width, default.height, alt,
+        '' if eager else format_html(' loading="lazy"')
+    )
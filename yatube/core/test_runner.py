@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetRunner(DiscoverRunner):
+    """Прогон тестов, в котором превышение ``QUERY_BUDGETS`` — ошибка."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._query_budget_strict = settings.QUERY_BUDGET_STRICT
+        settings.QUERY_BUDGET_STRICT = True
+
+    def teardown_test_environment(self, **kwargs):
+        settings.QUERY_BUDGET_STRICT = self._query_budget_strict
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,134 @@
+"""
+Локальный сервер протокола Redis для тестов.
+
+Поддерживает только команды, которые использует ``RedisCache``.
+Время жизни ключей проверяется при обращении.
+"""
+import socketserver
+import threading
+import time
+
+
+class Store:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def execute(self, name, *args):
+        with self.lock:
+            return getattr(self, 'cmd_' + name.decode().lower())(*args)
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.data[key] if self.alive(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self.alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            milliseconds = int(options[options.index(b'PX') + 1])
+            self.expires[key] = time.monotonic() + milliseconds / 1000
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self.alive(key):
+                deleted += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return deleted
+
+    def cmd_exists(self, key):
+        return int(self.alive(key))
+
+    def cmd_incrby(self, key, delta):
+        value = int(self.data[key] if self.alive(key) else 0) + int(delta)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_pexpire(self, key, milliseconds):
+        if not self.alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(milliseconds) / 1000
+        return 1
+
+    def cmd_persist(self, key):
+        return int(self.expires.pop(key, None) is not None)
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        self.expires.clear()
+        return 'OK'
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            try:
+                reply = self.server.store.execute(*command)
+            except Exception as error:
+                self.wfile.write(b'-ERR %s\r\n' % str(error).encode())
+                continue
+            self.wfile.write(self.encode(reply))
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line.startswith(b'*'):
+            return None
+        command = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            command.append(self.rfile.read(length + 2)[:-2])
+        return command
+
+    def encode(self, reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, str):
+            return b'+%s\r\n' % reply.encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(map(self.encode, reply))
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), Handler)
+        self.store = Store()
+
+    @property
+    def location(self):
+        return '%s:%d' % self.server_address
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,192 @@
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from ..cache_backends import (
+    HashRing, NearCache, RedisCache, ShardedCache, memcached_key)
+from ..cache_config import caches_from_url
+from .resp_server import RespServer
+
+
+class RedisCacheTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RespServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = RedisCache(self.server.location, {})
+        self.cache.clear()
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_values_round_trip(self):
+        """Значения любых типов читаются такими же, какими записаны"""
+        values = {'int': 5, 'text': 'пост', 'dict': {'a': [1, 2]},
+                  'bool': True, 'bytes': b'\x80raw'}
+        self.cache.set_many(values)
+        self.assertEqual(self.cache.get_many(list(values) + ['nope']), values)
+        self.assertIsNone(self.cache.get('nope'))
+
+    def test_add_and_incr(self):
+        """add не перезаписывает ключ, incr работает только с существующим"""
+        self.assertTrue(self.cache.add('lock', 1))
+        self.assertFalse(self.cache.add('lock', 2))
+        self.assertEqual(self.cache.incr('lock', 10), 11)
+        self.assertEqual(self.cache.get('lock'), 11)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_timeouts(self):
+        """Ключ истекает по времени, нулевое время жизни удаляет ключ"""
+        self.cache.set('short', 'value', 0.05)
+        self.cache.set('forever', 'value', None)
+        time.sleep(0.1)
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertTrue(self.cache.has_key('forever'))
+        self.cache.set('forever', 'value', 0)
+        self.assertFalse(self.cache.has_key('forever'))
+
+    def test_reconnects_after_server_drop(self):
+        """Оборванное соединение открывается заново"""
+        self.cache.set('key', 'value')
+        self.cache.connection.sock.close()
+        self.assertEqual(self.cache.get('key'), 'value')
+
+
+class ShardedCacheTests(SimpleTestCase):
+    def sharded(self, servers):
+        return ShardedCache(servers, {'OPTIONS': {
+            'NODE_BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'NODE_OPTIONS': {'MAX_ENTRIES': 10000},
+        }})
+
+    def test_keys_spread_over_nodes(self):
+        """Ключи распределяются по всем узлам примерно поровну"""
+        cache = self.sharded(['shard-a', 'shard-b', 'shard-c'])
+        cache.clear()
+        keys = [f'key{number}' for number in range(3000)]
+        cache.set_many({key: key for key in keys})
+        self.assertEqual(cache.get_many(keys), {key: key for key in keys})
+        counts = [len(node._cache) for node in cache.nodes.values()]
+        self.assertEqual(sum(counts), len(keys))
+        for count in counts:
+            self.assertGreater(count, len(keys) / 3 * 0.7)
+
+    def test_adding_node_moves_few_keys(self):
+        """Новый узел забирает себе только свою долю ключей"""
+        keys = [f'key{number}' for number in range(3000)]
+        before = HashRing(['a', 'b', 'c'])
+        after = HashRing(['a', 'b', 'c', 'd'])
+        moved = [key for key in keys if before.node(key) != after.node(key)]
+        self.assertTrue(all(after.node(key) == 'd' for key in moved))
+        self.assertLess(len(moved), len(keys) / 4 * 1.3)
+
+    def test_redis_shards(self):
+        """Шарды Redis получают каждый свою часть ключей"""
+        servers = [RespServer().start() for _ in range(2)]
+        self.addCleanup(lambda: [server.stop() for server in servers])
+        cache = ShardedCache(
+            [server.location for server in servers],
+            {'OPTIONS': {'NODE_BACKEND': 'core.cache_backends.RedisCache'}})
+        self.addCleanup(cache.close)
+        cache.set_many({f'key{number}': number for number in range(100)})
+        self.assertEqual(cache.get('key42'), 42)
+        self.assertEqual(
+            sum(len(server.store.data) for server in servers), 100)
+        self.assertTrue(all(server.store.data for server in servers))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'near-cache-tests',
+    },
+})
+class NearCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        params = {'OPTIONS': {'TARGET': 'shared', 'L1_TIMEOUT': 2}}
+        self.first = NearCache('first', params)
+        self.second = NearCache('second', params)
+
+    def test_local_copy_is_stale_only_until_l1_timeout(self):
+        """Чужая запись становится видна не позже чем через L1_TIMEOUT"""
+        now = time.time()
+        with mock.patch(
+                'django.core.cache.backends.locmem.time.time',
+                return_value=now):
+            self.first.set('key', 'old')
+            self.assertEqual(self.second.get('key'), 'old')
+            self.first.set('key', 'new')
+            self.assertEqual(self.first.get('key'), 'new')
+            self.assertEqual(self.second.get('key'), 'old')
+        with mock.patch(
+                'django.core.cache.backends.locmem.time.time',
+                return_value=now + 3):
+            self.assertEqual(self.second.get('key'), 'new')
+
+    def test_add_checks_shared_cache(self):
+        """Блокировка через add видна всем процессам сразу"""
+        self.second.get('lock')
+        self.assertTrue(self.first.add('lock', 1))
+        self.assertFalse(self.second.add('lock', 1))
+        self.second.delete('lock')
+        self.assertTrue(self.first.add('lock', 1))
+
+    def test_incr_reads_shared_value(self):
+        """После incr процесс видит новое значение, а не свою копию"""
+        self.first.set('counter', 1)
+        self.assertEqual(self.first.incr('counter'), 2)
+        self.assertEqual(self.first.get('counter'), 2)
+
+
+class CacheConfigTests(SimpleTestCase):
+    def test_urls(self):
+        """Строка подключения разворачивается в настройки CACHES"""
+        self.assertEqual(
+            caches_from_url('')['default']['BACKEND'],
+            'django.core.cache.backends.locmem.LocMemCache')
+        self.assertEqual(
+            caches_from_url('file:///tmp/yatube')['default']['LOCATION'],
+            '/tmp/yatube')
+        single = caches_from_url('redis://localhost:6379/2')['default']
+        self.assertEqual(single['LOCATION'], 'localhost:6379')
+        self.assertEqual(single['OPTIONS'], {'DB': 2})
+        config = caches_from_url('memcached://a:11211,b:11211', 2)
+        self.assertEqual(config['default']['OPTIONS']['TARGET'], 'shared')
+        self.assertEqual(config['shared']['LOCATION'], ['a:11211', 'b:11211'])
+        self.assertEqual(
+            config['shared']['KEY_FUNCTION'],
+            'core.cache_backends.memcached_key')
+        with self.assertRaises(ValueError):
+            caches_from_url('mongodb://localhost')
+
+    def test_memcached_key(self):
+        """Недопустимые для memcached ключи заменяются хешем"""
+        self.assertEqual(memcached_key('index', '', 1), ':1:index')
+        for key in ('version:group:Тестовый слаг', 'x' * 300):
+            with self.subTest(key=key[:20]):
+                safe = memcached_key(key, '', 1)
+                self.assertRegex(safe, r'^[!-~]{1,250}$')
+                self.assertNotEqual(safe, memcached_key(key + '1', '', 1))
+
+    def test_settings_work_end_to_end(self):
+        """Настройки из строки подключения дают рабочий кеш"""
+        server = RespServer().start()
+        self.addCleanup(server.stop)
+        url = f'redis://{server.location},{server.location}'
+        with override_settings(CACHES=caches_from_url(url, 2)):
+            caches['default'].set('key', 'value')
+            self.assertEqual(caches['shared'].get('key'), 'value')
+            self.assertEqual(caches['default'].get('key'), 'value')
+            caches['shared'].close()
@@ -0,0 +1,130 @@
+import time
+import warnings
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import SimpleTestCase, override_settings
+
+from .. import db_router
+from ..caching import (
+    bump_version, cache_timeout, get_or_compute, get_version, metrics,
+    reset_request, served_stale, version_key,
+)
+
+
+class VersionTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_only_given_scope(self):
+        """Смена версии затрагивает только указанную область"""
+        group = get_version(('group', 'slug'))
+        index = get_version(('index',))
+        bump_version(('group', 'slug'))
+        self.assertNotEqual(get_version(('group', 'slug')), group)
+        self.assertEqual(get_version(('index',)), index)
+
+    def test_version_key_is_memcached_safe(self):
+        """Слаги с пробелами и кириллицей не дают предупреждений о ключе"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            version = get_version(('group', 'Тестовый слаг'))
+            bump_version(('group', 'Тестовый слаг'))
+            self.assertNotEqual(
+                get_version(('group', 'Тестовый слаг')), version)
+        self.assertNotEqual(
+            version_key(('group', 'a:b')), version_key(('group', 'a', 'b')))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=10)
+class CacheTimeoutTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        reset_request()
+        db_router.reset()
+
+    def tearDown(self):
+        db_router.reset()
+
+    def test_fresh_version_shortens_replica_values(self):
+        """После смены версии прочитанное с реплики хранится до конца окна"""
+        self.assertEqual(cache_timeout(600), 600)
+        bump_version(('index',))
+        get_version(('index',))
+        self.assertLessEqual(cache_timeout(600), 10)
+        db_router.pin_to_primary()
+        self.assertEqual(cache_timeout(600), 600)
+
+    def test_old_version_keeps_full_timeout(self):
+        """Давно сменившаяся версия не укорачивает срок"""
+        get_version(('index',))
+        later = time.time() + 60
+        with mock.patch('core.caching.time.time', return_value=later):
+            reset_request()
+            get_version(('index',))
+            self.assertEqual(cache_timeout(600), 600)
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        reset_request()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'value {self.calls}'
+
+    def test_hit_after_miss(self):
+        """Повторный запрос отдаётся из кеша без пересчёта"""
+        get_or_compute('test', 'key', self.compute, 60)
+        value = get_or_compute('test', 'key', self.compute, 60)
+        self.assertEqual(value, 'value 1')
+        stats = metrics.snapshot()['test']
+        self.assertEqual(
+            (stats['miss'], stats['hit'], stats['recompute']), (1, 1, 1))
+
+    @override_settings(CACHE_LOCK_WAIT=0)
+    def test_stale_value_served_while_locked(self):
+        """Пока другой процесс пересчитывает, отдаётся старое значение"""
+        get_or_compute('test', 'key:v1', self.compute, 60, stale_key='key')
+        cache.add('lock:key:v2', 1)
+        value = get_or_compute(
+            'test', 'key:v2', self.compute, 60, stale_key='key')
+        self.assertEqual(value, 'value 1')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(metrics.snapshot()['test']['stale'], 1)
+
+    @override_settings(CACHE_LOCK_WAIT=0)
+    def test_value_built_from_stale_input_not_stored(self):
+        """После старого значения пересчитанное не сохраняется под версией"""
+        get_or_compute('test', 'key:v1', self.compute, 60, stale_key='key')
+        cache.add('lock:key:v2', 1)
+        get_or_compute('test', 'key:v2', self.compute, 60, stale_key='key')
+        self.assertTrue(served_stale())
+        value = get_or_compute('page', 'page:v2', self.compute, 60)
+        self.assertEqual(value, 'value 2')
+        self.assertIsNone(cache.get('page:v2'))
+        self.assertIsNone(cache.get('lock:page:v2'))
+
+    @override_settings(CACHE_EARLY_EXPIRY_BETA=1.0)
+    def test_early_expiry_recomputes_before_deadline(self):
+        """Дорогое значение пересчитывается раньше срока"""
+        with mock.patch('core.caching.time.time', return_value=1000.0):
+            cache.set('key', ('old', 1010.0, 5.0))
+            with mock.patch('core.caching.random.random', return_value=0.1):
+                value = get_or_compute('test', 'key', self.compute, 60)
+            self.assertEqual(value, 'old')
+            with mock.patch('core.caching.random.random', return_value=0.99):
+                value = get_or_compute('test', 'key', self.compute, 60)
+            self.assertEqual(value, 'value 1')
+
+    def test_expired_value_not_recomputed_twice(self):
+        """Истёкшее значение пересчитывает только владелец блокировки"""
+        cache.set('key', ('old', 0, 0.0))
+        cache.add('lock:key', 1)
+        self.assertEqual(
+            get_or_compute('test', 'key', self.compute, 60), 'old')
+        self.assertEqual(self.calls, 0)
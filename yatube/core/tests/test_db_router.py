@@ -0,0 +1,137 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import db_router
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class RouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.PrimaryReplicaRouter()
+        db_router.reset()
+
+    def tearDown(self):
+        db_router.reset()
+
+    def test_reads_go_to_replicas(self):
+        """Чтение уходит на реплики, запись — в основную базу"""
+        self.assertIn(
+            self.router.db_for_read(Post), settings.DATABASE_REPLICAS)
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_read_after_write_uses_primary(self):
+        """После записи чтение в том же запросе идёт из основной базы"""
+        self.router.db_for_write(Post)
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_migrations_only_on_primary(self):
+        """Схема меняется только в основной базе"""
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+class ReplicaPinMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_write_sets_pin_cookie(self):
+        """После записи пользователь получает cookie привязки к основной"""
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Text'})
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+
+    def test_read_does_not_set_pin_cookie(self):
+        """Простое чтение не привязывает пользователя к основной базе"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertFalse(db_router.is_pinned())
+
+
+class ReplicaReadYourWritesTests(TransactionTestCase):
+    """Основная база в памяти и отстающая реплика в файле SQLite."""
+    replica = 'replica_test'
+    databases = {'default', replica}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.databases[cls.replica] = {
+            'ENGINE': 'core.db.sqlite3',
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[cls.replica].close()
+        del connections[cls.replica]
+        del connections.databases[cls.replica]
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    def replicate(self):
+        """Копирует основную базу в реплику, как это делает репликация."""
+        primary = connections['default']
+        primary.ensure_connection()
+        target = sqlite3.connect(connections.databases[self.replica]['NAME'])
+        primary.connection.backup(target)
+        target.close()
+
+    def test_author_reads_own_post_before_replica_catches_up(self):
+        """Автор видит свой пост сразу, чтение с реплики — после репликации"""
+        author = User.objects.create_user(username='author')
+        self.replicate()
+        client = Client()
+        client.force_login(author)
+        profile = reverse('posts:profile', kwargs={'username': 'author'})
+        with override_settings(DATABASE_REPLICAS=[self.replica]):
+            client.post(reverse('posts:post_create'), {'text': 'Fresh'})
+            cache.clear()
+            self.assertContains(client.get(profile), 'Fresh')
+
+            db_router.reset()
+            self.assertFalse(Post.objects.filter(text='Fresh').exists())
+            self.replicate()
+            self.assertTrue(Post.objects.filter(text='Fresh').exists())
+
+    @override_settings(REPLICA_PIN_SECONDS=2)
+    def test_replica_reads_after_change_cached_briefly(self):
+        """Прочитанное с отстающей реплики после изменения живёт недолго"""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        self.replicate()
+        anonymous = Client()
+        user = Client()
+        user.force_login(reader)
+        profile = reverse('posts:profile', kwargs={'username': 'author'})
+        with override_settings(DATABASE_REPLICAS=[self.replica]):
+            Post.objects.create(author=author, text='Fresh')
+            self.assertNotContains(user.get(profile), 'Fresh')
+            self.assertNotContains(anonymous.get(profile), 'Fresh')
+            self.replicate()
+            later = time.time() + 3
+            with mock.patch('time.time', return_value=later):
+                self.assertContains(user.get(profile), 'Fresh')
+                self.assertContains(anonymous.get(profile), 'Fresh')
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..query_budget import QueryBudgetExceeded, collect, query_shape
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_VIEWS=())
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text='Text')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tests_run_in_strict_mode(self):
+        """В тестах превышение бюджета — ошибка"""
+        self.assertTrue(settings.QUERY_BUDGET_STRICT)
+
+    def test_stats_in_headers(self):
+        """Число запросов и время отдаются в заголовках ответа"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertEqual(response['X-Query-Duplicates'], '0')
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^sql;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+$')
+
+    def test_exceeded_budget_fails(self):
+        """Запросы сверх бюджета роняют тест"""
+        with override_settings(QUERY_BUDGETS={'posts:index': 0}):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'posts:index'):
+                self.client.get(reverse('posts:index'))
+        cache.clear()
+        with override_settings(
+                QUERY_BUDGETS={'posts:index': 0}, QUERY_BUDGET_STRICT=False):
+            with self.assertLogs('core.query_budget', 'WARNING'):
+                self.client.get(reverse('posts:index'))
+
+    def test_repeated_queries_in_template_detected(self):
+        """Запрос в шаблоне на каждый пост обнаруживается как N+1"""
+        template = Template(
+            '{% for post in posts %}{{ post.author.posts.count }}{% endfor %}')
+        with collect() as stats:
+            template.render(Context({'posts': Post.objects.all()}))
+        self.assertEqual(stats.duplicates, 4)
+        problems = stats.problems('posts:index')
+        self.assertEqual(len(problems), 3)
+        self.assertIn('выполнен 3 раз', problems[-1])
+
+    def test_query_shape_ignores_list_length(self):
+        """Списки IN разной длины считаются одной формой запроса"""
+        self.assertEqual(
+            query_shape('SELECT 1 WHERE id IN (%s, %s, %s)'),
+            query_shape('SELECT 1 WHERE id IN (%s)'))
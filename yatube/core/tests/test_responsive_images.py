@@ -0,0 +1,44 @@
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from posts.images import Rendition
+
+
+class ResponsiveImageTests(SimpleTestCase):
+    renditions = {
+        'card': Rendition(
+            'card.jpg', '/media/card.jpg', 960, 339,
+            {'image/webp': '/media/card.webp'}),
+        'card_320': Rendition(
+            'card_320.jpg', '/media/card_320.jpg', 320, 113,
+            {'image/webp': '/media/card_320.webp'}),
+    }
+
+    def render(self, **context):
+        template = Template(
+            '{% load responsive_images %}'
+            '{% responsive_image renditions "card" eager=eager %}')
+        return template.render(
+            Context(dict(context, renditions=self.renditions)))
+
+    def test_srcset_from_metadata(self):
+        """Тег строит srcset по всем ширинам и указывает размеры"""
+        html = self.render(eager=False)
+        self.assertInHTML(
+            '<img class="card-img my-2" src="/media/card.jpg" '
+            'srcset="/media/card_320.jpg 320w, /media/card.jpg 960w" '
+            'sizes="(max-width: 992px) 100vw, 960px" width="960" '
+            'height="339" alt="" decoding="async" loading="lazy">',
+            html)
+        self.assertIn(
+            'srcset="/media/card_320.webp 320w, /media/card.webp 960w"',
+            html)
+
+    def test_first_image_is_not_lazy(self):
+        """Первое изображение на странице загружается сразу"""
+        self.assertNotIn('loading="lazy"', self.render(eager=True))
+
+    def test_no_renditions(self):
+        """Без готовых копий тег ничего не выводит"""
+        self.renditions = {}
+        self.assertEqual(self.render(eager=False), '')
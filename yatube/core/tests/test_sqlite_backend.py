@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.handler = ConnectionHandler({
+            'default': {
+                'ENGINE': 'core.db.sqlite3',
+                'NAME': os.path.join(self.directory, 'db.sqlite3'),
+            },
+            'other': {
+                'ENGINE': 'core.db.sqlite3',
+                'NAME': os.path.join(self.directory, 'db.sqlite3'),
+                'OPTIONS': {'pragmas': {'busy_timeout': 0}},
+            },
+        })
+
+    def tearDown(self):
+        self.handler.close_all()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pragma(self, name, alias='default'):
+        with self.handler[alias].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Новое соединение работает в WAL с заданными настройками"""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('busy_timeout', 'other'), 0)
+
+    def test_transaction_takes_write_lock_at_begin(self):
+        """Транзакция сразу берёт блокировку на запись"""
+        tuned = self.handler['default']
+        with tuned.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        tuned._start_transaction_under_autocommit()
+        with self.assertRaises(OperationalError):
+            with self.handler['other'].cursor() as cursor:
+                cursor.execute('INSERT INTO item DEFAULT VALUES')
+        tuned.cursor().execute('ROLLBACK')
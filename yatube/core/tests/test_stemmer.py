@@ -0,0 +1,20 @@
+from django.test import SimpleTestCase
+
+from ..stemmer import stem, stem_words
+
+
+class StemmerTests(SimpleTestCase):
+    def test_word_forms_share_stem(self):
+        """Разные формы слова приводятся к одной основе"""
+        cases = {
+            'собака': 'собак', 'собаками': 'собак', 'собакой': 'собак',
+            'красивая': 'красив', 'читала': 'чита', 'читавший': 'чита',
+            'важнейшие': 'важн', 'длинный': 'длин', 'ёлки': 'елк',
+        }
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_stem_words(self):
+        """Текст разбивается на слова без знаков препинания"""
+        self.assertEqual(stem_words('Собаки, кошки!'), ['собак', 'кошк'])
@@ -1,10 +1,167 @@
+from datetime import datetime, time, timedelta
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db.models import CASCADE, Max, Min, QuerySet
+from django.utils import timezone
+
+from . import deletion, search
+from .models import Comment, DeletionJob, Follow, Group, ImageJob, Post
+from .paginators import EstimatedCountPaginator
+
+
+class IndexSeekQuerySet(QuerySet):
+    """
+    Выборка для ``date_hierarchy`` без полного просмотра таблицы.
+
+    ``dates()`` находит каждое следующее значение отдельным запросом
+    ``>= граница ORDER BY поле LIMIT 1`` по индексу, а ``Min``/``Max``
+    считаются так же по одному краю индекса: SQLite сам так делает,
+    только если в запросе один агрегат.
+    """
+    def dates(self, field_name, kind, order='ASC'):
+        rows = self.order_by(field_name).values_list(field_name, flat=True)
+        values = []
+        lower = None
+        while True:
+            page = rows
+            if lower is not None:
+                page = rows.filter(**{f'{field_name}__gte': lower})
+            first = page.first()
+            if first is None:
+                break
+            value, upper = date_bounds(first, kind)
+            values.append(value)
+            lower = datetime.combine(upper, time.min)
+            if timezone.is_aware(first):
+                lower = timezone.make_aware(lower)
+        return values[::-1] if order == 'DESC' else values
+
+    def aggregate(self, *args, **kwargs):
+        if args or not all(
+            isinstance(aggregate, (Min, Max)) and aggregate.filter is None
+            and hasattr(aggregate.source_expressions[0], 'name')
+            for aggregate in kwargs.values()
+        ):
+            return super().aggregate(*args, **kwargs)
+        result = {}
+        for alias, aggregate in kwargs.items():
+            field = aggregate.source_expressions[0].name
+            ordering = field if isinstance(aggregate, Min) else f'-{field}'
+            result[alias] = self.filter(
+                **{f'{field}__isnull': False}
+            ).order_by(ordering).values_list(field, flat=True).first()
+        return result
+
+
+def date_bounds(moment, kind):
+    """Начало периода ``kind`` с датой ``moment`` и начало следующего."""
+    if isinstance(moment, datetime):
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(moment)
+        moment = moment.date()
+    if kind == 'year':
+        start = moment.replace(month=1, day=1)
+        return start, start.replace(year=start.year + 1)
+    if kind == 'month':
+        start = moment.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    return moment, moment + timedelta(days=1)
+
+
+class LoadedAutocompleteSelect(AutocompleteSelect):
+    """Подпись выбранного значения берётся из уже загруженного объекта."""
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        if self.selected is None or [str(self.selected.pk)] != [
+                str(item) for item in value]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, self.selected.pk,
+            self.choices.field.label_from_instance(self.selected),
+            True, len(options)))
+        return [(None, options, 0)]
+
+
+class PostChangeListForm(forms.ModelForm):
+    """Строка списка постов: группа уже выбрана ``list_select_related``."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        widget = getattr(widget, 'widget', widget)
+        if isinstance(widget, LoadedAutocompleteSelect):
+            widget.selected = self.instance.group
+
+
+class DeferredDeletionMixin:
+    """
+    Удаление через ``posts.deletion``: объект сразу скрывается, а
+    связанные строки очищает фоновая команда. Страница подтверждения
+    не обходит все связанные объекты, как это делает ``Collector``.
+    """
+    def delete_model(self, request, obj):
+        deletion.schedule(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            deletion.schedule(obj)
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            self.get_perms_needed(objs, request),
+            [],
+        )
 
-from .models import Comment, Follow, Group, Post
+    def get_perms_needed(self, objs, request):
+        """
+        Модели удаляемых вместе с ``objs`` строк, на удаление которых
+        у пользователя нет прав, как в ``admin.utils.get_deleted_objects``.
+        Наличие строк проверяется запросом только для таких моделей.
+        """
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        for model, lookup in cascade_relations(self.model):
+            model_admin = self.admin_site._registry.get(model)
+            if (model_admin is None
+                    or model._meta.verbose_name in perms_needed
+                    or model_admin.has_delete_permission(request)):
+                continue
+            if model._base_manager.filter(
+                    **{f'{lookup}__in': objs}).exists():
+                perms_needed.add(model._meta.verbose_name)
+        return perms_needed
+
+
+def cascade_relations(model, prefix='', seen=None):
+    """Модели, строки которых удаляются каскадом, и пути до ``model``."""
+    seen = seen or {model}
+    for relation in model._meta.related_objects:
+        related = relation.related_model
+        if relation.on_delete is not CASCADE or related in seen:
+            continue
+        lookup = relation.field.name + prefix
+        yield related, lookup
+        yield from cascade_relations(
+            related, f'__{lookup}', seen | {related})
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без полного ``COUNT(*)`` и без запроса на каждую строку."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(DeferredDeletionMixin, LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -13,11 +170,68 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('group',)
+    raw_id_fields = ('author',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexSeekQuerySet(
+            queryset.model, queryset.query, using=queryset._db)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.autocomplete_fields:
+            kwargs['widget'] = LoadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search.matching(queryset, search_term), False
+
+
+@admin.register(Group)
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug', 'posts_count')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
 
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+
+@admin.register(Comment)
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'text', 'post', 'author', 'created')
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('post', 'author')
+
+
+@admin.register(Follow)
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'post', 'status', 'attempts', 'updated')
+    list_filter = ('status',)
+    list_select_related = ('post',)
+    raw_id_fields = ('post',)
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'kind', 'object_id', 'status', 'step', 'deleted', 'updated')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('step', 'deleted', 'attempts', 'error')
@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import follows
+
+
+def followed_authors(request):
+    """Подписки пользователя; запрос выполняется только при обращении."""
+    return {
+        'followed_author_ids': SimpleLazyObject(
+            lambda: follows.followed_ids(request)),
+    }
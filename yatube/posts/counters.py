@@ -0,0 +1,87 @@
+"""
+Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарными ``UPDATE ... SET n = n + 1`` из сигналов
+моделей и могут быть пересчитаны целиком командой ``rebuild_counters``.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def get_stats(user):
+    """Счётчики пользователя; недостающая строка создаётся на лету."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        user.stats = UserStats.objects.get_or_create(user=user)[0]
+        return user.stats
+
+
+def bump_user(user_id, delta=1, **fields):
+    if user_id is None:
+        return
+    changes = {
+        field: F(field) + delta for field, enabled in fields.items()
+        if enabled
+    }
+    updated = UserStats.objects.filter(user_id=user_id).update(**changes)
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        UserStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def bump_group(group_id, delta=1):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=F('posts_count') + delta)
+
+
+def bump_post(post_id, delta=1):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta)
+
+
+def recount_posts(post_ids):
+    """Пересчитывает комментарии к перечисленным постам."""
+    Post.all_objects.filter(pk__in=post_ids).update(
+        comments_count=_count_of(Comment.objects, 'post'))
+
+
+def recount_groups(group_ids):
+    """Пересчитывает посты в перечисленных группах."""
+    Group.objects.filter(pk__in=group_ids).update(
+        posts_count=_count_of(Post.objects, 'group'))
+
+
+def _count_of(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def rebuild():
+    """Пересчитывает все счётчики несколькими массовыми UPDATE."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True)
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id) for user_id in missing.iterator()),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    UserStats.objects.update(
+        posts_count=_count_of(Post.objects, 'author'),
+        followers_count=_count_of(Follow.objects, 'author'),
+        following_count=_count_of(Follow.objects, 'user'),
+    )
+    Group.objects.update(posts_count=_count_of(Post.objects, 'group'))
+    Post.objects.update(comments_count=_count_of(Comment.objects, 'post'))
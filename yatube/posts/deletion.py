@@ -0,0 +1,130 @@
+"""
+Удаление пользователей и постов без одной огромной транзакции.
+
+``schedule()`` сразу скрывает содержимое: пост (или все посты
+пользователя) помечается ``deleted`` и пропадает из лент, поиска и
+счётчиков, пользователь теряет ``is_active``. Связанные строки затем
+удаляет команда ``purge_deletions`` порциями по ``DELETION_BATCH_SIZE``,
+каждая порция — в своей транзакции вместе с отметкой о прогрессе
+задачи, поэтому прерванная очистка продолжается с того же шага.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from core.caching import bump_version
+
+from . import counters, search
+from .models import (Comment, DeletionJob, FeedEntry, Follow, Group, Post,
+                     UserStats)
+from .signals import bump_post_pages
+
+User = get_user_model()
+
+
+def schedule(obj):
+    """Скрывает пост или пользователя и ставит очистку в очередь."""
+    if isinstance(obj, Post):
+        return delete_post(obj)
+    if isinstance(obj, User):
+        return delete_user(obj)
+    raise TypeError(f'Отложенное удаление не поддерживается: {obj!r}')
+
+
+def enqueue(kind, object_id):
+    """Задача очистки; упавшая ранее снова ставится в очередь."""
+    job = DeletionJob.objects.get_or_create(
+        kind=kind, object_id=object_id)[0]
+    if job.status == DeletionJob.FAILED:
+        job.status = DeletionJob.PENDING
+        job.attempts = 0
+        job.error = ''
+        job.save(update_fields=('status', 'attempts', 'error', 'updated'))
+    return job
+
+
+def delete_post(post):
+    with transaction.atomic():
+        hidden = Post.all_objects.filter(
+            pk=post.pk, deleted=False).update(deleted=True)
+        if hidden:
+            counters.bump_user(post.author_id, -1, posts_count=True)
+            counters.bump_group(post.group_id, -1)
+        job = enqueue(DeletionJob.POST, post.pk)
+    search.remove_post(post.pk)
+    bump_post_pages(post)
+    return job
+
+
+def delete_user(user):
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        posts = Post.all_objects.filter(author_id=user.pk, deleted=False)
+        group_ids = set(posts.exclude(group=None).values_list(
+            'group_id', flat=True).distinct())
+        posts.update(deleted=True)
+        comments = Comment.objects.filter(author_id=user.pk)
+        post_ids = set(comments.values_list('post_id', flat=True).distinct())
+        comments.update(deleted=True)
+        UserStats.objects.filter(user_id=user.pk).update(posts_count=0)
+        counters.recount_groups(group_ids)
+        counters.recount_posts(post_ids)
+        job = enqueue(DeletionJob.USER, user.pk)
+    search.remove_author_posts(user.pk)
+    bump_version(('index',), ('users',), ('groups',), ('profile', user.pk))
+    bump_version(*(('post', post_id) for post_id in post_ids))
+    bump_version(*(
+        ('group', slug) for slug in Group.objects.filter(
+            pk__in=group_ids).values_list('slug', flat=True)))
+    return job
+
+
+def steps(job):
+    """
+    Выборки, которые очищаются по очереди; последняя — сам объект.
+
+    Каждая выборка описывает оставшиеся строки, поэтому повторный
+    проход шага после сбоя безопасен.
+    """
+    pk = job.object_id
+    if job.kind == DeletionJob.POST:
+        return [
+            FeedEntry.objects.filter(post_id=pk),
+            Comment.all_objects.filter(post_id=pk),
+            Post.all_objects.filter(pk=pk),
+        ]
+    return [
+        FeedEntry.objects.filter(post__author_id=pk),
+        FeedEntry.objects.filter(user_id=pk),
+        Follow.objects.filter(user_id=pk),
+        Follow.objects.filter(author_id=pk),
+        Comment.all_objects.filter(author_id=pk),
+        Comment.all_objects.filter(post__author_id=pk),
+        Post.all_objects.filter(author_id=pk),
+        User.objects.filter(pk=pk),
+    ]
+
+
+def purge(job, batch_size=None, pause=0):
+    """Удаляет строки задачи порциями, сохраняя шаг и число удалённых."""
+    if batch_size is None:
+        batch_size = settings.DELETION_BATCH_SIZE
+    queries = steps(job)
+    while job.step < len(queries):
+        queryset = queries[job.step]
+        # Без ORDER BY планировщик идёт по индексу условия шага, а не
+        # перебирает таблицу по первичному ключу.
+        pks = list(queryset.order_by().values_list(
+            'pk', flat=True)[:batch_size])
+        with transaction.atomic():
+            if pks:
+                queryset.model._base_manager.filter(pk__in=pks).delete()
+                job.deleted += len(pks)
+            else:
+                job.step += 1
+            job.save(update_fields=('step', 'deleted', 'updated'))
+        if pks and pause:
+            time.sleep(pause)
+    job.finish()
@@ -0,0 +1,174 @@
+"""
+Потоковая выгрузка постов, комментариев и подписок.
+
+Строки читаются через ``.values_list().iterator(chunk_size=...)``
+порциями без кэша выборки и сразу превращаются в байты NDJSON или CSV,
+поэтому память не растёт вместе с объёмом таблицы. Сжатие gzip тоже
+потоковое: ``zlib`` отдаёт готовые куски по мере накопления.
+"""
+import csv
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, DeletionJob, Follow, Post
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class ExportError(ValueError):
+    pass
+
+
+class Dataset:
+    """
+    Что выгружать: модель, столбцы и поля для фильтров. ``condition``
+    отсекает строки, которые уже скрыты и ждут фоновой очистки.
+    """
+
+    def __init__(self, model, columns, author=None, group=None, date=None,
+                 condition=None):
+        self.model = model
+        self.columns = columns
+        self.filters = {'author': author, 'group': group, 'date': date}
+        self.condition = condition or Q()
+
+    def queryset(self, author=None, group=None, since=None, until=None):
+        rows = self.model.objects.filter(self.condition).order_by('pk')
+        lookups = {}
+        if author:
+            lookups[self.field('author') + '__username'] = author
+        if group:
+            lookups[self.field('group') + '__slug'] = group
+        if since:
+            lookups[self.field('date') + '__gte'] = since
+        if until:
+            lookups[self.field('date') + '__lt'] = until
+        return rows.filter(**lookups).values_list(*self.columns)
+
+    def field(self, name):
+        field = self.filters[name]
+        if field is None:
+            raise ExportError(
+                f'Выгрузку {self.model._meta.model_name} нельзя '
+                f'фильтровать по {name}')
+        return field
+
+
+def pending_user_ids():
+    return DeletionJob.objects.filter(
+        kind=DeletionJob.USER).values('object_id')
+
+
+DATASETS = {
+    'posts': Dataset(
+        Post,
+        ('id', 'author_id', 'group_id', 'pub_date', 'text', 'image',
+         'comments_count'),
+        author='author', group='group', date='pub_date'),
+    'comments': Dataset(
+        Comment,
+        ('id', 'post_id', 'author_id', 'created', 'text'),
+        author='author', group='post__group', date='created',
+        condition=Q(post__deleted=False)),
+    'follows': Dataset(
+        Follow,
+        ('id', 'user_id', 'author_id'),
+        author='author',
+        condition=~Q(user_id__in=pending_user_ids())
+        & ~Q(author_id__in=pending_user_ids())),
+}
+
+
+def parse_moment(value, end=False):
+    """Дата или дата-время; голая дата ``until`` включает весь день."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ExportError(f'Неверная дата: {value}')
+        moment = datetime.combine(day, time.min)
+        if end:
+            moment += timedelta(days=1)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def rows(name, author=None, group=None, since=None, until=None,
+         chunk_size=DEFAULT_CHUNK_SIZE):
+    """Заголовок и итератор строк выбранной выгрузки."""
+    if name not in DATASETS:
+        raise ExportError(f'Неизвестная выгрузка: {name}')
+    dataset = DATASETS[name]
+    queryset = dataset.queryset(
+        author, group, parse_moment(since), parse_moment(until, end=True))
+    return dataset.columns, queryset.iterator(chunk_size=chunk_size)
+
+
+class LineBuffer:
+    """Файлоподобный объект для ``csv.writer``: отдаёт записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(columns, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row)
+
+
+def encode(lines, batch=DEFAULT_CHUNK_SIZE):
+    """Склеивает строки в куски, чтобы не отдавать их по одной."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= batch:
+            yield ''.join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield ''.join(chunk).encode()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(name, fmt='ndjson', compress=False, **filters):
+    """Байтовые куски выгрузки; ошибки параметров — до первого запроса."""
+    if fmt not in FORMATS:
+        raise ExportError(f'Неизвестный формат: {fmt}')
+    columns, iterator = rows(name, **filters)
+    lines = ndjson_lines if fmt == 'ndjson' else csv_lines
+    chunks = encode(lines(columns, iterator))
+    return gzipped(chunks) if compress else chunks
+
+
+def filename(name, fmt, compress=False):
+    return f'{name}.{fmt}' + ('.gz' if compress else '')
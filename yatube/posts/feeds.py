@@ -0,0 +1,267 @@
+"""
+Материализованная лента подписок.
+
+Новый пост раскладывается по лентам подписчиков автора (fan-out on write).
+Для авторов, у которых больше ``FEED_FANOUT_MAX_FOLLOWERS`` подписчиков,
+записи не раскладываются: их посты подмешиваются в ленту при чтении.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+
+from . import counters
+from .models import FeedEntry, Follow, Post, UserStats
+from .paginators import estimate_count
+
+User = get_user_model()
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def pull_authors_key(user_id):
+    return f'feed:pull_authors:{user_id}'
+
+
+def is_pull_author(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def pull_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются без fan-out."""
+    def compute():
+        return list(
+            User.objects.filter(
+                following__user=user,
+                stats__followers_count__gte=(
+                    settings.FEED_FANOUT_MAX_FOLLOWERS)
+            ).values_list('pk', flat=True)
+        )
+    return cache.get_or_set(
+        pull_authors_key(user.pk), compute,
+        settings.FEED_PULL_AUTHORS_TIMEOUT
+    )
+
+
+def bump_followers(author_id, delta=1):
+    """
+    Меняет число подписчиков автора. Если оно пересекло
+    ``FEED_FANOUT_MAX_FOLLOWERS``, у подписчиков сбрасывается список
+    pull-авторов: иначе до его истечения новые посты автора не попадут
+    ни в записи ленты, ни в выборки при чтении.
+    """
+    with transaction.atomic():
+        # Строка счётчика заблокирована до конца транзакции, поэтому
+        # прочитанное значение — результат именно этого изменения.
+        counters.bump_user(author_id, delta, followers_count=True)
+        count = UserStats.objects.filter(user_id=author_id).values_list(
+            'followers_count', flat=True).first()
+    threshold = settings.FEED_FANOUT_MAX_FOLLOWERS
+    if count == (threshold if delta > 0 else threshold - 1):
+        followers = Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True).iterator()
+        while True:
+            keys = [
+                pull_authors_key(user_id)
+                for user_id in islice(followers, FANOUT_BATCH_SIZE)
+            ]
+            if not keys:
+                break
+            cache.delete_many(keys)
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if post.author_id is None or is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    entries = [
+        FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    ]
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту последними постами автора после подписки."""
+    cache.delete(pull_authors_key(user_id))
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_LIMIT]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    cache.delete(pull_authors_key(user_id))
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def rename(condition, names):
+    """Условие ``Q`` с полями, переименованными по словарю ``names``."""
+    renamed = Q()
+    renamed.connector = condition.connector
+    renamed.negated = condition.negated
+    for child in condition.children:
+        if isinstance(child, Q):
+            renamed.children.append(rename(child, names))
+            continue
+        lookup, value = child
+        field, separator, rest = lookup.partition('__')
+        renamed.children.append(
+            (names.get(field, field) + separator + rest, value))
+    return renamed
+
+
+class Timeline:
+    """
+    Лента подписок: слияние выборок, упорядоченных по своим индексам.
+
+    Записи fan-out читаются по индексу ленты ``(user, -pub_date,
+    -post_id)``, посты каждого pull-автора — отдельной выборкой по
+    индексу ``(author, -pub_date, -id)``. Условие по ключу и LIMIT
+    получает каждая выборка, а строки сливаются в Python. Поддержана
+    та часть API ``QuerySet``, которой пользуются ``KeysetPaginator``
+    и JSON API.
+    """
+    model = Post
+    ordered = True
+    keys = ('pub_date', 'id')
+
+    def __init__(self, sources, descending=True, conditions=(),
+                 related=(), fields=None):
+        self.sources = sources
+        self.descending = descending
+        self.conditions = tuple(conditions)
+        self.related = tuple(related)
+        self.fields = fields
+
+    def _clone(self, **changes):
+        state = {
+            'sources': self.sources,
+            'descending': self.descending,
+            'conditions': self.conditions,
+            'related': self.related,
+            'fields': self.fields,
+        }
+        state.update(changes)
+        return Timeline(**state)
+
+    def order_by(self, *ordering):
+        names = tuple(name.lstrip('-') for name in ordering)
+        directions = {name.startswith('-') for name in ordering}
+        if names != self.keys or len(directions) != 1:
+            raise ValueError(
+                f'Ленту можно упорядочить только по {self.keys}')
+        return self._clone(descending=directions.pop())
+
+    def reverse(self):
+        return self._clone(descending=not self.descending)
+
+    def filter(self, *args, **kwargs):
+        return self._clone(
+            conditions=self.conditions + (Q(*args, **kwargs),))
+
+    def select_related(self, *fields):
+        return self._clone(related=self.related + fields)
+
+    def values(self, *fields):
+        return self._clone(fields=fields)
+
+    def querysets(self, limit=None):
+        """Выборки источников с условиями, сортировкой и LIMIT."""
+        for condition, names in self.sources:
+            for extra in self.conditions:
+                condition &= rename(extra, names)
+            ordering = [F(names.get(key, key)) for key in self.keys]
+            posts = Post.objects.filter(condition).order_by(*(
+                key.desc() if self.descending else key.asc()
+                for key in ordering))
+            if self.related:
+                posts = posts.select_related(*self.related)
+            if self.fields is not None:
+                posts = posts.values(*self.fields)
+            yield posts if limit is None else posts[:limit]
+
+    def _key(self, row):
+        if isinstance(row, dict):
+            return tuple(row[key] for key in self.keys)
+        return tuple(getattr(row, key) for key in self.keys)
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        if index.step is not None:
+            raise ValueError('Шаг среза не поддерживается')
+        start, stop = index.start or 0, index.stop
+        rows = heapq.merge(
+            *self.querysets(stop), key=self._key, reverse=self.descending)
+        return list(islice(rows, start, stop))
+
+    def __iter__(self):
+        return iter(self[:None])
+
+    def count(self):
+        return sum(estimate_count(posts) for posts in self.querysets())
+
+
+def timeline(user):
+    """Посты ленты подписок пользователя."""
+    authors = pull_authors(user)
+    entries = Q(feed_entries__user=user)
+    if authors:
+        entries &= ~Q(author_id__in=authors)
+    sources = [(entries, {
+        'pub_date': 'feed_entries__pub_date',
+        'id': 'feed_entries__post_id',
+    })]
+    sources.extend((Q(author_id=author_id), {}) for author_id in authors)
+    return Timeline(sources)
+
+
+def rebuild():
+    """
+    Собирает ленты заново одним ``INSERT ... SELECT`` по подпискам.
+
+    Нужен после массовой загрузки данных в обход сигналов. Как и при
+    подписке, от каждого автора берутся последние
+    ``FEED_BACKFILL_LIMIT`` постов, а посты авторов с fan-out при
+    чтении в ленты не попадают.
+    """
+    using = router.db_for_write(FeedEntry)
+    FeedEntry.objects.using(using).all().delete()
+    entry, post, follow, stats = (
+        model._meta.db_table for model in (FeedEntry, Post, Follow, UserStats))
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {entry} (user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date FROM {follow} f '
+            f'JOIN (SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC) AS n '
+            f'FROM {post} WHERE NOT deleted) p '
+            f'ON p.author_id = f.author_id AND p.n <= %s '
+            f'LEFT JOIN {stats} s ON s.user_id = f.author_id '
+            f'WHERE COALESCE(s.followers_count, 0) < %s',
+            [settings.FEED_BACKFILL_LIMIT, settings.FEED_FANOUT_MAX_FOLLOWERS]
+        )
+        return cursor.rowcount
@@ -0,0 +1,45 @@
+"""
+Подписки текущего пользователя для страниц со многими авторами.
+
+Множество id авторов, на которых подписан пользователь, загружается
+одним запросом и хранится в кеше под версией ``('follows', user_id)``,
+которую сигналы меняют при подписке и отписке. В пределах запроса
+множество запоминается на объекте ``request``, поэтому кнопки подписки
+у всех постов страницы обходятся одним обращением к кешу.
+"""
+from django.conf import settings
+
+from core.caching import get_or_compute, get_version
+
+from .models import Follow
+
+REQUEST_ATTR = '_followed_author_ids'
+
+
+def load(user_id):
+    return frozenset(
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True)
+    )
+
+
+def followed_ids(request):
+    """Множество id авторов, на которых подписан пользователь запроса."""
+    if not request.user.is_authenticated:
+        return frozenset()
+    if not hasattr(request, REQUEST_ATTR):
+        user_id = request.user.pk
+        version = get_version(('follows', user_id))
+        setattr(request, REQUEST_ATTR, get_or_compute(
+            'followed_authors',
+            f'followed_authors:{user_id}:{version}',
+            lambda: load(user_id),
+            settings.FOLLOWED_AUTHORS_CACHE_TIMEOUT
+        ))
+    return getattr(request, REQUEST_ATTR)
+
+
+def forget(request):
+    """Сбрасывает запомненное множество после подписки или отписки."""
+    if hasattr(request, REQUEST_ATTR):
+        delattr(request, REQUEST_ATTR)
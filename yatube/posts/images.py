@@ -0,0 +1,187 @@
+"""
+Заранее подготовленные копии изображений постов.
+
+Копии нужных размеров создаются один раз после загрузки изображения,
+а их адреса и размеры хранятся в ``Post.image_renditions``. Шаблонам
+не нужно ни обращаться к хранилищу, ни пережимать картинку при показе.
+
+При ``IMAGE_PROCESSING = 'queue'`` сохранение поста только ставит задачу
+``ImageJob``, а копии готовит команда ``process_images``; до этого
+вместо изображения показывается заглушка.
+
+Файлы прежних копий удаляются после того, как пост сохранён с новыми;
+пока задача в очереди, их пути хранятся в описании под ``previous``.
+"""
+import json
+import logging
+import os
+from collections import namedtuple
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'card': (960, 339),
+    'card_640': (640, 226),
+    'card_320': (320, 113),
+}
+RENDITIONS_DIR = 'posts/renditions'
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+
+IMAGE_ERRORS = (
+    OSError, ValueError, SuspiciousFileOperation,
+    Image.DecompressionBombError,
+)
+
+Rendition = namedtuple(
+    'Rendition', ('name', 'url', 'width', 'height', 'sources'))
+
+
+def extra_formats():
+    """Дополнительные форматы, которые умеет кодировать Pillow."""
+    formats = []
+    if 'AVIF' in Image.SAVE:
+        formats.append(('AVIF', 'avif', 'image/avif', AVIF_QUALITY))
+    if features.check('webp'):
+        formats.append(('WEBP', 'webp', 'image/webp', WEBP_QUALITY))
+    return formats
+
+
+def load_meta(raw):
+    return json.loads(raw) if raw else {}
+
+
+def dump_meta(source, status, renditions=None, previous=()):
+    meta = {
+        'source': source,
+        'status': status,
+        'renditions': renditions or {},
+    }
+    if previous:
+        meta['previous'] = sorted(previous)
+    return json.dumps(meta)
+
+
+def rendition_paths(meta):
+    """Пути всех файлов копий из описания, включая ещё не удалённые."""
+    paths = set(meta.get('previous', ()))
+    for item in meta.get('renditions', {}).values():
+        paths.add(item['name'])
+        paths.update(item.get('sources', {}).values())
+    return paths
+
+
+def delete_files(paths):
+    for path in paths:
+        try:
+            default_storage.delete(path)
+        except OSError as error:
+            logger.warning('Не удалось удалить копию %s: %s', path, error)
+
+
+def load_renditions(raw):
+    """Словарь копий из значения поля ``Post.image_renditions``."""
+    return {
+        name: Rendition(
+            item['name'], default_storage.url(item['name']),
+            item['width'], item['height'],
+            {
+                mime: default_storage.url(path)
+                for mime, path in item.get('sources', {}).items()
+            }
+        )
+        for name, item in load_meta(raw).get('renditions', {}).items()
+    }
+
+
+def is_current(post):
+    if not post.image:
+        return not post.image_renditions
+    return load_meta(post.image_renditions).get('source') == post.image.name
+
+
+def strip_metadata(image):
+    """Убирает EXIF и прочие метаданные перед повторным кодированием."""
+    image = ImageOps.exif_transpose(image)
+    image.info = {}
+    return image.convert('RGB')
+
+
+def encode(image, image_format, quality):
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def build_renditions(source_name):
+    """
+    Создаёт все копии изображения и возвращает их описание.
+
+    Работает только с хранилищем файлов и не обращается к базе, поэтому
+    может выполняться в отдельном процессе.
+    """
+    with default_storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        image.load()
+    image = strip_metadata(image)
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    renditions = {}
+    for name, size in RENDITIONS.items():
+        fitted = ImageOps.fit(
+            image, size, Image.LANCZOS, centering=(0.5, 0.5))
+        path = default_storage.save(
+            f'{RENDITIONS_DIR}/{name}/{stem}.jpg',
+            ContentFile(encode(fitted, 'JPEG', JPEG_QUALITY))
+        )
+        sources = {}
+        for image_format, extension, mime, quality in extra_formats():
+            sources[mime] = default_storage.save(
+                f'{RENDITIONS_DIR}/{name}/{stem}.{extension}',
+                ContentFile(encode(fitted, image_format, quality))
+            )
+        renditions[name] = {
+            'name': path, 'width': size[0], 'height': size[1],
+            'sources': sources,
+        }
+    return renditions
+
+
+def process_now(source_name, post_id=None):
+    try:
+        return dump_meta(source_name, READY, build_renditions(source_name))
+    except IMAGE_ERRORS as error:
+        logger.warning(
+            'Не удалось подготовить изображение поста %s: %s',
+            post_id, error)
+        return dump_meta(source_name, FAILED)
+
+
+def refresh_renditions(post, force=False):
+    """Готовит копии или ставит задачу, если изображение изменилось."""
+    if not force and is_current(post):
+        return
+    from .models import ImageJob
+
+    previous = rendition_paths(load_meta(post.image_renditions))
+    meta = ''
+    if post.image and settings.IMAGE_PROCESSING == 'queue':
+        meta = dump_meta(post.image.name, PENDING, previous=previous)
+        ImageJob.objects.create(post_id=post.pk, source=post.image.name)
+        previous = set()
+    elif post.image:
+        meta = process_now(post.image.name, post.pk)
+    post.image_renditions = meta
+    type(post).objects.filter(pk=post.pk).update(image_renditions=meta)
+    delete_files(previous - rendition_paths(load_meta(meta)))
@@ -0,0 +1,407 @@
+"""
+Массовая загрузка постов и комментариев из NDJSON или CSV.
+
+Файл читается потоком и делится на порции: для каждой порции авторы,
+группы и посты ищутся одним запросом на модель (с кэшем в памяти
+процесса), строки проверяются и вставляются одним ``bulk_create`` в
+своей транзакции. Если порция нарушает ограничение базы (например, один
+и тот же явный id в двух кусках файла), она вставляется заново по одной
+строке, и в отчёт попадают только плохие строки. ``bulk_create`` обходит
+``save()`` и сигналы, поэтому счётчики, поисковый индекс и ленты после
+загрузки пересобираются целиком, а версии кэша затронутых страниц
+сбрасываются — даже если загрузка прервалась на полпути.
+
+Поля строки поста: ``text``, ``author`` (username), необязательные
+``group`` (slug), ``pub_date`` и ``id``. Комментария: ``post`` (id
+поста), ``author``, ``text`` и необязательные ``created`` и ``id``.
+"""
+import csv
+import gzip
+import json
+import os
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import IntegrityError, connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.caching import bump_version
+
+from . import counters, feeds, search
+from .models import Comment, Group, Post
+
+User = get_user_model()
+
+FORMATS = ('ndjson', 'csv')
+DEFAULT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 20
+
+
+class RowError(ValueError):
+    pass
+
+
+class ShardError(Exception):
+    """Загрузка куска прервалась; ``result`` — то, что уже записано."""
+
+    def __init__(self, message, result):
+        super().__init__(message, result)
+        self.message = message
+        self.result = result
+
+    def __str__(self):
+        return self.message
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает ``auto_now_add``, чтобы сохранить даты из данных."""
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+def shards(paths, fmt=None, count=1):
+    """
+    Делит входные файлы на куски для параллельной загрузки.
+
+    Несжатый NDJSON режется по байтовым смещениям на границах строк.
+    CSV (в кавычках бывают переводы строк) и gzip читаются целиком.
+    """
+    result = []
+    for path in paths:
+        file_format = fmt or guess_format(path)
+        size = os.path.getsize(path)
+        parts = count if file_format == 'ndjson' and not path.endswith(
+            '.gz') else 1
+        step = max(1, -(-size // parts))
+        result.extend(
+            (path, file_format, start, min(start + step, size))
+            for start in range(0, max(size, 1), step)
+        )
+    return result
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def ndjson_rows(path, start, end):
+    """Строки, которые начинаются в байтах ``[start, end)``."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as source:
+        if start:
+            source.seek(start - 1)
+            source.readline()
+        while path.endswith('.gz') or source.tell() < end:
+            offset = source.tell()
+            line = source.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            location = f'{path}@{offset}'
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield location, RowError(f'неверный JSON: {error}')
+                continue
+            if not isinstance(row, dict):
+                yield location, RowError('строка должна быть объектом')
+                continue
+            yield location, row
+
+
+def csv_rows(path):
+    with open_text(path) as source:
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield f'{path}:{reader.line_num}', row
+
+
+def read_rows(path, fmt, start=0, end=None):
+    if fmt == 'csv':
+        return csv_rows(path)
+    return ndjson_rows(path, start, end)
+
+
+def parse_moment(value):
+    if not value:
+        return timezone.now()
+    if not isinstance(value, str):
+        raise RowError(f'неверная дата: {value!r}')
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise RowError(f'неверная дата: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_id(value, name='id'):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{name} должен быть числом')
+
+
+def required_text(row, name):
+    value = row.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise RowError(f'нет поля {name}')
+    return value
+
+
+class Resolver:
+    """Ключ -> id с кэшем; недостающие ключи порции — одним запросом."""
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.known = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.known}
+        if not missing:
+            return
+        for key, pk in self.queryset.filter(
+                **{f'{self.field}__in': missing}
+        ).values_list(self.field, 'pk'):
+            self.known[key] = pk
+        for key in missing:
+            self.known.setdefault(key, None)
+
+    def get(self, key, name):
+        pk = self.known.get(key)
+        if pk is None:
+            raise RowError(f'{name} не найден: {key}')
+        return pk
+
+
+class Loader:
+    model = None
+    date_field = None
+
+    def __init__(self):
+        self.authors = Resolver(User.objects, 'username')
+        self.ids = Resolver(self.model._base_manager, 'pk')
+        self.touched = {}
+
+    def prepare(self, rows):
+        self.authors.load(row.get('author') for row in rows)
+        self.ids.load(
+            parse_id(row['id']) for row in rows
+            if str(row.get('id') or '').isdigit())
+
+    def build(self, row):
+        pk = parse_id(row.get('id'))
+        if pk is not None and self.ids.known.get(pk) is not None:
+            raise RowError(f'id {pk} уже занят')
+        obj = self.model(
+            pk=pk,
+            author_id=self.authors.get(row.get('author'), 'автор'),
+            text=required_text(row, 'text'),
+        )
+        setattr(obj, self.date_field, parse_moment(row.get(self.date_field)))
+        return obj
+
+    def accept(self, obj):
+        """Явный id занят и для следующих строк файла."""
+        if obj.pk is not None:
+            self.ids.known[obj.pk] = obj.pk
+
+    def touch(self, name, value):
+        self.touched.setdefault(name, set()).add(value)
+
+
+class PostLoader(Loader):
+    model = Post
+    date_field = 'pub_date'
+
+    def __init__(self):
+        super().__init__()
+        self.groups = Resolver(Group.objects, 'slug')
+
+    def prepare(self, rows):
+        super().prepare(rows)
+        self.groups.load(row.get('group') for row in rows)
+
+    def build(self, row):
+        post = super().build(row)
+        slug = row.get('group')
+        if slug:
+            post.group_id = self.groups.get(slug, 'группа')
+            self.touch('group', slug)
+        self.touch('profile', post.author_id)
+        return post
+
+
+class CommentLoader(Loader):
+    model = Comment
+    date_field = 'created'
+
+    def __init__(self):
+        super().__init__()
+        self.posts = Resolver(Post.objects, 'pk')
+
+    def prepare(self, rows):
+        super().prepare(rows)
+        post_ids = []
+        for row in rows:
+            try:
+                post_ids.append(parse_id(row.get('post'), 'post'))
+            except RowError:
+                pass
+        self.posts.load(post_ids)
+
+    def build(self, row):
+        comment = super().build(row)
+        comment.post_id = self.posts.get(
+            parse_id(row.get('post'), 'post'), 'пост')
+        self.touch('post', comment.post_id)
+        return comment
+
+
+LOADERS = {'posts': PostLoader, 'comments': CommentLoader}
+
+
+def batches(rows, size):
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_objects(loader, batch, report):
+    """Объекты порции с местом в файле; ошибки строк — в ``report``."""
+    loader.prepare([row for _, row in batch if isinstance(row, dict)])
+    built = []
+    for location, row in batch:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            obj = loader.build(row)
+            loader.accept(obj)
+            built.append((location, obj))
+        except RowError as error:
+            report(location, error)
+    return built
+
+
+def insert_objects(model, date_field, built, report):
+    """
+    Вставляет порцию одним запросом, а при нарушении ограничения —
+    по одной строке. Возвращает число вставленных строк.
+    """
+    def insert(objects):
+        with explicit_dates(date_field), transaction.atomic():
+            model.objects.bulk_create(objects)
+
+    try:
+        insert([obj for _, obj in built])
+        return len(built)
+    except IntegrityError:
+        pass
+    created = 0
+    for location, obj in built:
+        try:
+            insert([obj])
+            created += 1
+        except IntegrityError as error:
+            report(location, error)
+    return created
+
+
+def load_shard(kind, shard, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Загружает один кусок файла; вызывается и в дочерних процессах.
+
+    Возвращает число созданных строк, число и первые ошибки, а также
+    затронутые профили, группы и посты для сброса кэша. При сбое
+    поднимает ``ShardError`` с итогами уже записанных порций.
+    """
+    path, fmt, start, end = shard
+    loader = LOADERS[kind]()
+    date_field = loader.model._meta.get_field(loader.date_field)
+    result = {
+        'created': 0,
+        'failed': 0,
+        'errors': [],
+        'touched': loader.touched,
+    }
+
+    def report(location, error):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append(f'{location}: {error}')
+
+    try:
+        for batch in batches(read_rows(path, fmt, start, end), batch_size):
+            built = build_objects(loader, batch, report)
+            result['created'] += insert_objects(
+                loader.model, date_field, built, report)
+    except Exception as error:
+        raise ShardError(f'{path}: {error}', result) from error
+    return result
+
+
+def reset_sequences(*models):
+    """После вставки с явными id счётчик первичного ключа отстаёт."""
+    using = router.db_for_write(models[0])
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_derived():
+    """Пересобирает счётчики, поисковый индекс и ленты после загрузки."""
+    with transaction.atomic():
+        counters.rebuild()
+        indexed = search.rebuild()
+    entries = feeds.rebuild()
+    return indexed, entries
+
+
+def invalidate(touched):
+    scopes = [('index',)]
+    scopes.extend(('profile', pk) for pk in touched.get('profile', ()))
+    scopes.extend(('group', slug) for slug in touched.get('group', ()))
+    scopes.extend(('post', pk) for pk in touched.get('post', ()))
+    bump_version(*scopes)
+
+
+def merge(results):
+    total = {'created': 0, 'failed': 0, 'errors': [], 'touched': {}}
+    for result in results:
+        total['created'] += result['created']
+        total['failed'] += result['failed']
+        total['errors'].extend(result['errors'])
+        for name, values in result['touched'].items():
+            total['touched'].setdefault(name, set()).update(values)
+    total['errors'] = total['errors'][:MAX_REPORTED_ERRORS]
+    return total
@@ -0,0 +1,88 @@
+"""
+Очереди фоновых задач в таблицах базы: ``ImageJob`` и ``DeletionJob``.
+
+Задача берётся в работу условным ``UPDATE ... WHERE status = pending``,
+поэтому несколько обработчиков не получат одну и ту же задачу. Задачи,
+которые слишком долго числятся выполняемыми, считаются брошенными
+упавшим обработчиком и при запуске команды возвращаются в очередь.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils import timezone
+
+CLAIM_MARGIN = 10
+
+
+class JobQueue:
+    """Очередь задач модели с полями ``JobStatusMixin``."""
+
+    def __init__(self, model, stale_after_setting):
+        self.model = model
+        self.stale_after_setting = stale_after_setting
+
+    def requeue_stale(self):
+        """Возвращает в очередь задачи, брошенные упавшим обработчиком."""
+        deadline = timezone.now() - timedelta(
+            seconds=getattr(settings, self.stale_after_setting))
+        return self.model.objects.filter(
+            status=self.model.RUNNING, updated__lt=deadline
+        ).update(status=self.model.PENDING)
+
+    def claim(self, limit):
+        """
+        Id до ``limit`` задач, переведённых в работу этим обработчиком.
+
+        Кандидатов берётся с запасом: часть из них может успеть забрать
+        другой обработчик.
+        """
+        pending = self.model.objects.filter(
+            status=self.model.PENDING
+        ).values_list('id', flat=True)[:limit + CLAIM_MARGIN]
+        claimed = []
+        for job_id in pending:
+            if len(claimed) >= limit:
+                break
+            if self.model.objects.filter(
+                pk=job_id, status=self.model.PENDING
+            ).update(
+                status=self.model.RUNNING,
+                attempts=F('attempts') + 1,
+                updated=timezone.now()
+            ):
+                claimed.append(job_id)
+        return claimed
+
+    def poll(self, limit, once=False, interval=2.0):
+        """Порции взятых задач; без ``once`` ждёт новые задачи бесконечно."""
+        while True:
+            claimed = self.claim(limit)
+            if claimed:
+                yield claimed
+            elif once:
+                return
+            else:
+                time.sleep(interval)
+
+
+class JobCommand(BaseCommand):
+    """Общие параметры команд-обработчиков очереди ``queue``."""
+    queue = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Пауза между опросами пустой очереди, в секундах'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать текущую очередь и завершиться'
+        )
+
+    def poll(self, limit, options):
+        self.queue.requeue_stale()
+        return self.queue.poll(
+            limit, options['once'], options['poll_interval'])
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты, комментарии или подписки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(export.DATASETS))
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='ndjson')
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжимать вывод на лету')
+        parser.add_argument(
+            '--output', help='Файл для выгрузки, по умолчанию stdout')
+        parser.add_argument('--author', help='Имя пользователя автора')
+        parser.add_argument('--group', help='Slug группы')
+        parser.add_argument('--since', help='С даты (включительно)')
+        parser.add_argument('--until', help='По дату (включительно)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export.stream(
+                options['dataset'], options['format'], options['gzip'],
+                author=options['author'], group=options['group'],
+                since=options['since'], until=options['until'],
+                chunk_size=options['chunk_size'])
+        except export.ExportError as error:
+            raise CommandError(error)
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            return
+        binary = getattr(self.stdout._out, 'buffer', None)
+        if binary is not None:
+            for chunk in chunks:
+                binary.write(chunk)
+            binary.flush()
+        elif options['gzip']:
+            raise CommandError('Сжатую выгрузку нужно писать в файл')
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
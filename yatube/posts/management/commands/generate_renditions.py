@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Готовит копии изображений для постов, у которых их ещё нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии и для уже обработанных постов'
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(
+            image__isnull=True).only('id', 'image', 'image_renditions')
+        processed = 0
+        for post in posts.iterator(chunk_size=options['chunk_size']):
+            if options['force'] or not images.is_current(post):
+                images.refresh_renditions(post, force=options['force'])
+                processed += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано изображений: {processed}'))
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово загружает посты или комментарии из NDJSON/CSV '
+        'и пересобирает счётчики, поисковый индекс и ленты'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(importer.LOADERS))
+        parser.add_argument(
+            'paths', nargs='+', help='Файлы NDJSON или CSV, можно .gz')
+        parser.add_argument(
+            '--format', choices=importer.FORMATS,
+            help='По умолчанию определяется по расширению файла')
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.DEFAULT_BATCH_SIZE,
+            help='Строк в одной транзакции')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 0 — загружать в текущем процессе')
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересобирать производные данные (для серии загрузок)')
+
+    def handle(self, *args, **options):
+        missing = [path for path in options['paths']
+                   if not os.path.isfile(path)]
+        if missing:
+            raise CommandError(f'Файлы не найдены: {", ".join(missing)}')
+        shards = importer.shards(
+            options['paths'], options['format'], max(options['workers'], 1))
+        load = partial(
+            importer.load_shard, options['dataset'],
+            batch_size=options['batch_size'])
+        if options['workers'] and len(shards) > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(
+                min(options['workers'], len(shards)),
+                mp_context=multiprocessing.get_context('fork')
+            ) as pool:
+                futures = [pool.submit(load, shard) for shard in shards]
+                results, failures = self.collect(
+                    future.result for future in futures)
+        else:
+            results, failures = self.collect(
+                partial(load, shard) for shard in shards)
+        total = importer.merge(results)
+        model = importer.LOADERS[options['dataset']].model
+        importer.reset_sequences(model)
+        if not options['skip_rebuild']:
+            indexed, entries = importer.rebuild_derived()
+            self.stdout.write(
+                f'Проиндексировано постов: {indexed}, '
+                f'записей в лентах: {entries}')
+        importer.invalidate(total['touched'])
+        for error in total['errors']:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {total["created"]}, с ошибками: {total["failed"]}'))
+        if failures:
+            raise CommandError(
+                'Загрузка прервана: ' + '; '.join(failures))
+
+    def collect(self, calls):
+        """
+        Итоги всех кусков, в том числе прерванных: записанные порции
+        остаются в базе, и производные данные пересобираются и для них.
+        """
+        results, failures = [], []
+        for call in calls:
+            try:
+                results.append(call())
+            except importer.ShardError as error:
+                results.append(error.result)
+                failures.append(str(error))
+        return results, failures
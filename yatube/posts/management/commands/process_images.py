@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+from posts import images
+from posts.jobs import JobCommand, JobQueue
+from posts.models import ImageJob, Post
+from posts.signals import bump_post_pages
+
+
+def build(job_id, source):
+    """Выполняется в дочернем процессе и не обращается к базе."""
+    try:
+        return job_id, images.build_renditions(source), ''
+    except images.IMAGE_ERRORS as error:
+        return job_id, None, str(error)
+
+
+class Command(JobCommand):
+    queue = JobQueue(ImageJob, 'IMAGE_JOB_STALE_AFTER')
+    help = (
+        'Обрабатывает очередь изображений: декодирует, кадрирует, '
+        'убирает EXIF и перекодирует копии в пуле процессов'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 0 — обрабатывать в текущем процессе'
+        )
+        parser.add_argument('--batch-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        pool = None
+        if options['workers']:
+            pool = ProcessPoolExecutor(
+                options['workers'],
+                mp_context=multiprocessing.get_context('fork')
+            )
+        processed = 0
+        try:
+            for claimed in self.poll(options['batch_size'], options):
+                jobs = ImageJob.objects.filter(
+                    pk__in=claimed).values_list('id', 'source')
+                if not jobs:
+                    continue
+                ids, sources = zip(*jobs)
+                if pool is None:
+                    results = map(build, ids, sources)
+                else:
+                    connections.close_all()
+                    results = pool.map(build, ids, sources)
+                for result in results:
+                    self.finish(*result)
+                    processed += 1
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано задач: {processed}'))
+
+    def finish(self, job_id, renditions, error):
+        job = ImageJob.objects.select_related(
+            'post', 'post__group').filter(pk=job_id).first()
+        if job is None:
+            return
+        if renditions is None:
+            if job.retry(error, settings.IMAGE_JOB_MAX_ATTEMPTS):
+                self.publish(job, images.dump_meta(job.source, images.FAILED))
+            return
+        self.publish(
+            job, images.dump_meta(job.source, images.READY, renditions))
+        job.finish()
+
+    def publish(self, job, meta):
+        """
+        Сохраняет описание копий и удаляет файлы, которые в нём больше
+        не упоминаются: прежние копии или, если изображение поста уже
+        сменилось, только что созданные.
+        """
+        previous = images.rendition_paths(
+            images.load_meta(job.post.image_renditions))
+        current = images.rendition_paths(images.load_meta(meta))
+        updated = Post.objects.filter(
+            pk=job.post_id, image=job.source
+        ).update(image_renditions=meta)
+        if updated:
+            bump_post_pages(job.post)
+            images.delete_files(previous - current)
+        else:
+            images.delete_files(current - previous)
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import DatabaseError
+
+from posts import deletion
+from posts.jobs import JobCommand, JobQueue
+from posts.models import DeletionJob
+
+
+class Command(JobCommand):
+    queue = JobQueue(DeletionJob, 'DELETION_JOB_STALE_AFTER')
+    help = (
+        'Порциями удаляет строки пользователей и постов, '
+        'помеченных на удаление'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.DELETION_BATCH_SIZE,
+            help='Строк в одной транзакции'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Пауза между порциями, в секундах, чтобы не мешать записи'
+        )
+
+    def handle(self, *args, **options):
+        finished = 0
+        for claimed in self.poll(1, options):
+            job = DeletionJob.objects.filter(pk=claimed[0]).first()
+            if job is None:
+                continue
+            try:
+                deletion.purge(job, options['batch_size'], options['pause'])
+            except DatabaseError as error:
+                job.retry(str(error), settings.DELETION_JOB_MAX_ATTEMPTS)
+                self.stderr.write(f'{job}: {error}')
+                continue
+            finished += 1
+            self.stdout.write(f'{job}: удалено строк {job.deleted}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Завершено задач: {finished}'))
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-17 03:54
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_auto_20221019_1832'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ('-pub_date', '-id')},
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+BACKFILL_LIMIT = 1000
+
+
+def backfill_feed_entries(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    db = schema_editor.connection.alias
+    for user_id, author_id in Follow.objects.using(db).values_list(
+            'user_id', 'author_id').iterator():
+        posts = Post.objects.using(db).filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-id').values_list('id', 'pub_date')
+        FeedEntry.objects.using(db).bulk_create(
+            (
+                FeedEntry(user_id=user_id, post_id=post_id, pub_date=date)
+                for post_id, date in posts[:BACKFILL_LIMIT]
+            ),
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_feed_entries, migrations.RunPython.noop
+        ),
+    ]
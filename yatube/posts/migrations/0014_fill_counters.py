@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserStats = apps.get_model('posts', 'UserStats')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    db = schema_editor.connection.alias
+    UserStats.objects.using(db).bulk_create(
+        (
+            UserStats(user_id=pk) for pk in User.objects.using(
+                db).values_list('pk', flat=True).iterator()
+        ),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    UserStats.objects.using(db).update(
+        posts_count=count_of(Post.objects, 'author'),
+        followers_count=count_of(Follow.objects, 'author'),
+        following_count=count_of(Follow.objects, 'user'),
+    )
+    Group.objects.using(db).update(
+        posts_count=count_of(Post.objects, 'group'))
+    Post.objects.using(db).update(
+        comments_count=count_of(Comment.objects, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_fill_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_renditions',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
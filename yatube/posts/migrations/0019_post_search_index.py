@@ -0,0 +1,51 @@
+from django.db import migrations
+
+from core.stemmer import stem_words
+
+FTS_TABLE = 'posts_post_fts'
+PG_INDEX = 'posts_post_text_search_idx'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX {PG_INDEX} ON posts_post USING gin "
+            f"(to_tsvector('russian'::regconfig, COALESCE(text, '')))"
+        )
+    if vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"text, tokenize='unicode61 remove_diacritics 2')"
+    )
+    Post = apps.get_model('posts', 'Post')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            (
+                (pk, ' '.join(stem_words(text)))
+                for pk, text in Post.objects.using(
+                    schema_editor.connection.alias).values_list(
+                    'pk', 'text').iterator()
+            )
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {PG_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_comment_ordering'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
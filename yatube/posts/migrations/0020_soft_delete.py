@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'Пользователь'), ('post', 'Пост')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10)),
+                ('step', models.PositiveSmallIntegerField(default=0)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='deleted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='deletionjob',
+            index=models.Index(fields=['status', 'id'], name='deletion_job_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='deletionjob',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_deletion_job'),
+        ),
+    ]
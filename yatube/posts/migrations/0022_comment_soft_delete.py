@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_feed_entry_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='deleted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
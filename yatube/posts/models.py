@@ -1,10 +1,38 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+
+from . import images
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class AtomicSaveMixin:
+    """Сохраняет объект и обновляет счётчики в одной транзакции."""
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class CounterFieldsMixin:
+    """
+    Счётчики из ``counter_fields`` меняются только атомарными ``UPDATE``
+    в ``posts.counters``: обычное сохранение существующего объекта
+    не записывает обратно значения, загруженные в память.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not (args or self._state.adding or kwargs.get('force_insert')
+                or kwargs.get('update_fields') is not None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CounterFieldsMixin, models.Model):
     title = models.CharField(
         max_length=200,
         help_text='Введите название группы',
@@ -19,12 +47,21 @@ class Group(models.Model):
         help_text='Напишите описание к группе',
         verbose_name='Описаине'
     )
+    posts_count = models.IntegerField(default=0, editable=False)
+
+    counter_fields = ('posts_count',)
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class PublishedManager(models.Manager):
+    """Строки без отметки об удалении; удалённые ждут фоновой очистки."""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted=False)
+
+
+class Post(CounterFieldsMixin, AtomicSaveMixin, models.Model):
     LENGHT_STR_TEXT = 15
     text = models.TextField(
         help_text='Что вы хотите рассказать?',
@@ -48,15 +85,49 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True,
         null=True)
+    image_renditions = models.TextField(
+        blank=True, default='', editable=False)
+    comments_count = models.IntegerField(default=0, editable=False)
+    deleted = models.BooleanField(default=False, editable=False)
+
+    counter_fields = ('comments_count',)
+    objects = PublishedManager()
+    all_objects = models.Manager()
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                name='post_pub_date_idx',
+                fields=['-pub_date', '-id'],
+            ),
+            models.Index(
+                name='post_group_pub_date_idx',
+                fields=['group', '-pub_date', '-id'],
+            ),
+            models.Index(
+                name='post_author_pub_date_idx',
+                fields=['author', '-pub_date', '-id'],
+            ),
+        ]
 
     def __str__(self):
         return self.text[:self.LENGHT_STR_TEXT]
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        images.refresh_renditions(self)
+
+    @property
+    def renditions(self):
+        return images.load_renditions(self.image_renditions)
 
-class Comment(models.Model):
+    @property
+    def image_status(self):
+        return images.load_meta(self.image_renditions).get('status')
+
+
+class Comment(AtomicSaveMixin, models.Model):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -78,15 +149,25 @@ class Comment(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    deleted = models.BooleanField(default=False, editable=False)
+
+    objects = PublishedManager()
+    all_objects = models.Manager()
 
     class Meta:
-        ordering = ('-created',)
+        ordering = ('-created', '-id')
+        indexes = [
+            models.Index(
+                name='comment_post_created_id_idx',
+                fields=['post', '-created', '-id'],
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -109,3 +190,131 @@ class Follow(models.Model):
                 check=~models.Q(user=models.F('author'))
             ),
         ]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.IntegerField(default=0)
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_feed_entry',
+                fields=['user', 'post'],
+            ),
+        ]
+        indexes = [
+            models.Index(
+                name='feed_entry_user_date_idx',
+                fields=['user', '-pub_date', '-post'],
+            ),
+        ]
+
+
+class JobStatusMixin(models.Model):
+    """Состояние задачи фоновой очереди (см. ``posts.jobs``)."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    def finish(self):
+        self.status = self.DONE
+        self.error = ''
+        self.save(update_fields=('status', 'error', 'updated'))
+
+    def retry(self, error, max_attempts):
+        """Снова в очередь, а после последней попытки — в ошибку."""
+        failed = self.attempts >= max_attempts
+        self.status = self.FAILED if failed else self.PENDING
+        self.error = error
+        self.save(update_fields=('status', 'error', 'updated'))
+        return failed
+
+
+class ImageJob(JobStatusMixin):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_jobs'
+    )
+    source = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [
+            models.Index(
+                name='image_job_status_idx',
+                fields=['status', 'id'],
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.source} ({self.status})'
+
+
+class DeletionJob(JobStatusMixin):
+    USER = 'user'
+    POST = 'post'
+    KINDS = (
+        (USER, 'Пользователь'),
+        (POST, 'Пост'),
+    )
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    step = models.PositiveSmallIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('id',)
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_deletion_job',
+                fields=['kind', 'object_id'],
+            ),
+        ]
+        indexes = [
+            models.Index(
+                name='deletion_job_status_idx',
+                fields=['status', 'id'],
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} ({self.status})'
@@ -0,0 +1,306 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class KeysetPaginator(Paginator):
+    """
+    Паджинатор, который листает выборку по ключу сортировки
+    (по умолчанию ``(pub_date, id)``), а не через OFFSET.
+
+    Страницы, открытые по токенам ``?after=``/``?before=``, выбираются
+    условием по ключу, поэтому далёкая страница стоит столько же,
+    сколько первая. Ссылки вида ``?page=N`` продолжают работать.
+    """
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 **kwargs):
+        self.keys = tuple(keys)
+        object_list = object_list.order_by(*self.ordering)
+        super().__init__(object_list, per_page, **kwargs)
+
+    @property
+    def ordering(self):
+        return tuple(f'-{key}' for key in self.keys)
+
+    def page_from_query(self, query):
+        """Возвращает страницу по GET-параметрам запроса."""
+        try:
+            if query.get('after'):
+                return self.page_after(query['after'])
+            if query.get('before'):
+                return self.page_before(query['before'])
+        except InvalidCursor:
+            return self.get_page(1)
+        return self.get_page(query.get('page'))
+
+    def page(self, number):
+        page = super().page(number)
+        page.object_list = list(page.object_list)
+        return self._with_cursors(page, page.number < self.num_pages)
+
+    def rows_after(self, token=''):
+        """
+        Порция строк после курсора и курсор следующей порции.
+
+        Без номеров страниц и без ``COUNT``: для API и бесконечной ленты.
+        """
+        rows = self.object_list
+        number = 1
+        if token:
+            values, number = self.decode_cursor(token)
+            rows = rows.filter(self._keyset_filter(values, 'lt'))
+        rows = list(rows[:self.per_page + 1])
+        next_cursor = ''
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1], number + 1)
+        return rows, next_cursor
+
+    def page_after(self, token):
+        values, number = self.decode_cursor(token)
+        rows = list(
+            self.object_list.filter(self._keyset_filter(values, 'lt'))
+            [:self.per_page + 1]
+        )
+        if not rows:
+            return self.last_page(number - 1)
+        return self._build_page(rows, number)
+
+    def last_page(self, number):
+        """
+        Последние строки выборки, выбранные с конца по ключу.
+
+        Нужна, когда курсор указывает за конец выборки: номер страницы
+        берётся из курсора, поэтому ``COUNT`` и OFFSET не нужны.
+        """
+        rows = list(self.object_list.reverse()[:self.per_page])
+        rows.reverse()
+        if len(rows) < self.per_page:
+            number = 1
+        return self._build_page(rows, number, has_next=False)
+
+    def page_before(self, token):
+        values, number = self.decode_cursor(token)
+        rows = list(
+            self.object_list.filter(self._keyset_filter(values, 'gt'))
+            .reverse()[:self.per_page + 1]
+        )
+        if len(rows) <= self.per_page or number <= 1:
+            return self.get_page(1)
+        rows.reverse()
+        return self._build_page(rows[1:], number, has_next=True)
+
+    def _build_page(self, rows, number, has_next=None):
+        if has_next is None:
+            has_next = len(rows) > self.per_page
+        page = self._get_page(rows[:self.per_page], max(number, 1), self)
+        return self._with_cursors(page, has_next)
+
+    def _with_cursors(self, page, has_next):
+        rows = page.object_list
+        page.next_cursor = ''
+        page.previous_cursor = ''
+        if rows and has_next:
+            page.next_cursor = self.encode_cursor(rows[-1], page.number + 1)
+        if rows and page.number > 1:
+            page.previous_cursor = self.encode_cursor(
+                rows[0], page.number - 1)
+        return page
+
+    def _keyset_filter(self, values, lookup):
+        """
+        Условие «строго после ключа» для сортировки по убыванию.
+
+        Первое слагаемое (``pub_date <= x``) дублирует старший разряд ключа,
+        чтобы база могла использовать индекс как диапазон.
+        """
+        head = self.keys[0]
+        condition = Q()
+        for position in range(len(self.keys)):
+            branch = Q(**{
+                key: value for key, value
+                in zip(self.keys[:position], values[:position])
+            })
+            branch &= Q(**{
+                f'{self.keys[position]}__{lookup}': values[position]
+            })
+            condition |= branch
+        return Q(**{f'{head}__{lookup}e': values[0]}) & condition
+
+    def _key_values(self, row):
+        if isinstance(row, dict):
+            return [row[key] for key in self.keys]
+        return [getattr(row, key) for key in self.keys]
+
+    def encode_cursor(self, row, number):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in self._key_values(row)
+        ]
+        raw = json.dumps([values, number], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            values, number = json.loads(base64.urlsafe_b64decode(padded))
+            if len(values) != len(self.keys):
+                raise InvalidCursor('Неверный курсор')
+            model = self.object_list.model
+            values = [
+                model._meta.get_field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+            return values, int(number)
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise InvalidCursor('Неверный курсор')
+
+
+class CountFreePaginator(KeysetPaginator):
+    """
+    Паджинатор без ``COUNT(*)`` на каждый запрос.
+
+    Страница выбирается с одной лишней строкой, по которой определяется
+    наличие следующей страницы. Общее число записей берётся из подсказки,
+    из статистики таблицы или из кеша и нужно только для ссылки
+    «Последняя» и окна номеров страниц.
+    """
+    def __init__(self, object_list, per_page, count=None, window=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_hint = count
+        if window is None:
+            window = settings.PAGE_RANGE_WINDOW
+        self.window = window
+
+    @cached_property
+    def count(self):
+        if self.count_hint is not None:
+            return self.count_hint
+        if not isinstance(self.object_list, QuerySet):
+            return self.object_list.count()
+        return estimate_count(self.object_list)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть числом')
+        return max(number, 1)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            self._set_count(self.object_list.count())
+            return self.page(min(self.num_pages, number - 1))
+        return self._build_page(rows, number)
+
+    def page_state(self, page):
+        """Состояние страницы, пригодное для хранения в кеше."""
+        return page.object_list, page.number, bool(page.next_cursor)
+
+    def restore_page(self, state):
+        rows, number, has_next = state
+        return self._build_page(list(rows), number, has_next=has_next)
+
+    def page_window(self, number):
+        return range(
+            max(1, number - self.window),
+            min(self.num_pages, number + self.window) + 1
+        )
+
+    def _with_cursors(self, page, has_next):
+        seen = (page.number - 1) * self.per_page + len(page.object_list)
+        self._set_count(max(self.count, seen + 1) if has_next else seen)
+        page.page_window = self.page_window(page.number)
+        return super()._with_cursors(page, has_next)
+
+    def _set_count(self, count):
+        self.count = count
+        self.__dict__.pop('num_pages', None)
+
+
+def table_row_estimate(model, using='default'):
+    """Оценка числа строк таблицы по статистике планировщика."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [table]
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+def is_unfiltered(queryset):
+    """В выборке нет условий, кроме условия менеджера модели."""
+    where = queryset.query.where
+    if not where:
+        return True
+    base = queryset.model._default_manager.db_manager(queryset.db).all()
+    return _where_sql(queryset) == _where_sql(base)
+
+
+def _where_sql(queryset):
+    compiler = queryset.query.get_compiler(queryset.db)
+    return compiler.compile(queryset.query.where)
+
+
+def estimate_count(queryset):
+    """
+    Число записей выборки без полного ``COUNT(*)`` на каждый запрос.
+
+    Для выборки без условий (кроме условия менеджера модели) берётся
+    статистика таблицы, если таблица достаточно велика, иначе
+    выполняется точный подсчёт. Результат кешируется на
+    ``PAGINATOR_COUNT_TIMEOUT`` секунд.
+    """
+    def compute():
+        if is_unfiltered(queryset):
+            estimate = table_row_estimate(queryset.model, queryset.db)
+            if estimate and estimate >= settings.PAGINATOR_ESTIMATE_MIN_ROWS:
+                return estimate
+        return queryset.count()
+
+    query = str(queryset.query).encode()
+    key = 'paginator:count:' + hashlib.md5(query).hexdigest()
+    return cache.get_or_set(key, compute, settings.PAGINATOR_COUNT_TIMEOUT)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Паджинатор для админки: число записей берётся через
+    ``estimate_count``, а не полным ``COUNT(*)`` на каждый просмотр.
+    """
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
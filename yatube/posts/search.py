@@ -0,0 +1,209 @@
+"""
+Полнотекстовый поиск по тексту постов.
+
+На SQLite используется виртуальная таблица FTS5 ``posts_post_fts``,
+в которую пишутся основы слов (см. ``core.stemmer``), на PostgreSQL —
+``to_tsvector('russian', text)`` с GIN-индексом по выражению. Индекс
+обновляется сигналами при сохранении и удалении поста, а целиком
+перестраивается командой ``rebuild_search_index``.
+
+Результаты отсортированы по релевантности и листаются курсором
+``(score, id)``, так что дальние страницы стоят столько же, сколько первая.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from core.stemmer import stem_words
+
+from .models import Post
+from .paginators import InvalidCursor
+
+FTS_TABLE = 'posts_post_fts'
+PG_CONFIG = 'russian'
+REBUILD_BATCH_SIZE = 1000
+
+
+def vendor(using):
+    return connections[using].vendor
+
+
+def index_text(text):
+    return ' '.join(stem_words(text))
+
+
+def match_expression(query):
+    """Запрос FTS5: все основы слов запроса, каждая как префикс."""
+    return ' '.join(f'"{word}"*' for word in stem_words(query))
+
+
+def index_post(post):
+    using = router.db_for_write(Post, instance=post)
+    if vendor(using) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, index_text(post.text)]
+        )
+
+
+def remove_post(post_id):
+    using = router.db_for_write(Post)
+    if vendor(using) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def remove_author_posts(author_id):
+    """Убирает из индекса все посты автора одним запросом."""
+    using = router.db_for_write(Post)
+    if vendor(using) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ('
+            f'SELECT id FROM {Post._meta.db_table} WHERE author_id = %s)',
+            [author_id]
+        )
+
+
+def rebuild(posts=None):
+    """Заполняет индекс заново и возвращает число проиндексированных постов."""
+    using = router.db_for_write(Post)
+    if posts is None:
+        posts = Post.objects.all()
+    posts = posts.using(using)
+    if vendor(using) != 'sqlite':
+        return posts.count()
+    rows = posts.order_by('pk').values_list('pk', 'text').iterator()
+    total = 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        batch = []
+        for pk, text in rows:
+            batch.append((pk, index_text(text)))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                total += _insert(cursor, batch)
+        total += _insert(cursor, batch)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def _insert(cursor, batch):
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)', batch)
+    count = len(batch)
+    batch.clear()
+    return count
+
+
+def matching(queryset, query):
+    """Посты выборки, подходящие под запрос; порядок выборки сохраняется."""
+    connection_vendor = vendor(queryset.db)
+    if connection_vendor == 'sqlite':
+        expression = match_expression(query)
+        if not expression:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            where=[
+                f'{table}.id IN (SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s)'
+            ],
+            params=[expression]
+        )
+    if connection_vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+        return queryset.annotate(
+            search=SearchVector('text', config=PG_CONFIG)
+        ).filter(search=SearchQuery(query, config=PG_CONFIG))
+    return queryset.filter(text__icontains=query)
+
+
+def ranked(query, after=None, limit=settings.COUNT_POSTS):
+    """
+    Пары ``(id, score)`` по убыванию релевантности.
+
+    ``after`` — пара последнего показанного результата, следующая
+    порция начинается строго после неё.
+    """
+    using = router.db_for_read(Post)
+    connection_vendor = vendor(using)
+    if connection_vendor == 'sqlite':
+        return _ranked_sqlite(query, after, limit, using)
+    posts = Post.objects.using(using)
+    if connection_vendor == 'postgresql':
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVector)
+        vector = SearchVector('text', config=PG_CONFIG)
+        search_query = SearchQuery(query, config=PG_CONFIG)
+        posts = posts.annotate(
+            search=vector, score=SearchRank(vector, search_query)
+        ).filter(search=search_query)
+    else:
+        posts = matching(posts, query).annotate(
+            score=RawSQL('0', [], output_field=FloatField()))
+    if after is not None:
+        score, pk = after
+        posts = posts.filter(Q(score__lt=score) | Q(score=score, pk__gt=pk))
+    return list(
+        posts.order_by('-score', 'pk').values_list('pk', 'score')[:limit])
+
+
+def _ranked_sqlite(query, after, limit, using):
+    expression = match_expression(query)
+    if not expression:
+        return []
+    sql = (
+        f'SELECT id, score FROM ('
+        f'SELECT rowid AS id, -bm25({FTS_TABLE}) AS score '
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+    )
+    params = [expression]
+    if after is not None:
+        sql += ' WHERE score < %s OR (score = %s AND id > %s)'
+        params += [after[0], after[0], after[1]]
+    sql += ' ORDER BY score DESC, id LIMIT %s'
+    params.append(limit)
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def encode_cursor(score, pk):
+    raw = json.dumps([score, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        score, pk = json.loads(base64.urlsafe_b64decode(padded))
+        return float(score), int(pk)
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor('Неверный курсор')
+
+
+def search_posts(query, cursor='', per_page=settings.COUNT_POSTS):
+    """Страница результатов поиска и курсор следующей страницы."""
+    after = decode_cursor(cursor) if cursor else None
+    rows = ranked(query, after, per_page + 1)
+    page = rows[:per_page]
+    found = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, _ in page])
+    posts = [found[pk] for pk, _ in page if pk in found]
+    next_cursor = ''
+    if len(rows) > per_page:
+        next_cursor = encode_cursor(page[-1][1], page[-1][0])
+    return posts, next_cursor
@@ -0,0 +1,166 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.caching import bump_version
+
+from . import counters, feeds, search
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+DISPLAYED_USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def bump_post_pages(post, previous=None):
+    scopes = [('index',), ('post', post.pk), ('profile', post.author_id)]
+    group_ids = {post.group_id}
+    if previous is not None:
+        scopes.append(('profile', previous['author_id']))
+        group_ids.add(previous['group_id'])
+    group_ids.discard(None)
+    if group_ids == {post.group_id}:
+        slugs = [post.group.slug]
+    else:
+        slugs = Group.objects.filter(pk__in=group_ids).values_list(
+            'slug', flat=True)
+    scopes.extend(('group', slug) for slug in slugs)
+    bump_version(*scopes)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_owner(sender, instance, raw=False, **kwargs):
+    instance._previous = None
+    if instance.pk is not None and not raw:
+        instance._previous = Post.objects.filter(pk=instance.pk).values(
+            'author_id', 'group_id').first()
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        counters.bump_user(instance.author_id, posts_count=True)
+        counters.bump_group(instance.group_id)
+        return
+    if previous['author_id'] != instance.author_id:
+        counters.bump_user(previous['author_id'], -1, posts_count=True)
+        counters.bump_user(instance.author_id, posts_count=True)
+    if previous['group_id'] != instance.group_id:
+        counters.bump_group(previous['group_id'], -1)
+        counters.bump_group(instance.group_id)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_post_pages(instance, getattr(instance, '_previous', None))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    bump_post_pages(instance)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version(('post', instance.post_id))
+
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_group(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version(('index',), ('groups',), ('group', instance.slug))
+
+
+@receiver(pre_save, sender=User)
+def remember_user_names(sender, instance, raw=False, update_fields=None,
+                        **kwargs):
+    """Имя, которое показывается в лентах, до сохранения."""
+    instance._previous_names = None
+    if raw or instance.pk is None or update_fields is not None and not (
+            set(update_fields) & set(DISPLAYED_USER_FIELDS)):
+        return
+    instance._previous_names = User.objects.filter(pk=instance.pk).values(
+        *DISPLAYED_USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_names', None)
+    if raw or created or previous is None:
+        return
+    if any(previous[name] != getattr(instance, name)
+           for name in DISPLAYED_USER_FIELDS):
+        bump_version(('index',), ('users',), ('profile', instance.pk))
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    if instance.deleted:
+        return
+    counters.bump_user(instance.author_id, -1, posts_count=True)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if not instance.deleted:
+        counters.bump_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.user_id, following_count=True)
+        feeds.bump_followers(instance.author_id)
+        bump_version(('follows', instance.user_id))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.bump_user(instance.user_id, -1, following_count=True)
+    feeds.bump_followers(instance.author_id, -1)
+    bump_version(('follows', instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    feeds.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
@@ -0,0 +1,13 @@
+from django import template
+
+from .. import follows
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_following(context, author_id):
+    followed = context.get('followed_author_ids')
+    if followed is None:
+        followed = follows.followed_ids(context['request'])
+    return author_id in followed
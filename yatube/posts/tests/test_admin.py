@@ -0,0 +1,130 @@
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..admin import IndexSeekQuerySet
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AdminChangeListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        cls.author = User.objects.create_user(username='author')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {number}', slug=f'group-{number}',
+                description='Описание')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def create_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(
+                author=self.author, text=f'Пост {number}',
+                group=self.groups[number % len(self.groups)])
+            Comment.objects.create(post=post, author=self.author, text='Ок')
+
+    def queries_for(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        """Число запросов списков не зависит от числа строк"""
+        Follow.objects.create(user=self.admin, author=self.author)
+        urls = [
+            reverse(f'admin:posts_{model}_changelist')
+            for model in ('post', 'comment', 'follow', 'group')
+        ]
+        self.create_posts(2)
+        few = [self.queries_for(url) for url in urls]
+        self.create_posts(10)
+        self.assertEqual([self.queries_for(url) for url in urls], few)
+
+    def test_editable_group_keeps_selected_value(self):
+        """Редактируемая группа показывает только выбранное значение"""
+        self.create_posts(3)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        content = response.content.decode()
+        self.assertIn('<option value="%d" selected>Группа 0</option>'
+                      % self.groups[0].pk, content)
+        self.assertEqual(content.count('>Группа 1</option>'), 1)
+
+    def test_no_full_count(self):
+        """Полный COUNT(*) по таблице не выполняется"""
+        self.create_posts(2)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'Пост'})
+        self.assertEqual(response.context['cl'].full_result_count, None)
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    @override_settings(PAGINATOR_ESTIMATE_MIN_ROWS=1)
+    def test_unfiltered_count_is_estimated(self):
+        """Без фильтров число записей берётся из статистики таблицы"""
+        self.create_posts(2)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute(
+                "UPDATE sqlite_stat1 SET stat = '5000 1' "
+                "WHERE tbl = 'posts_post'")
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 5000)
+
+
+class IndexSeekQuerySetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        cls.dates = [
+            timezone.make_aware(datetime(2020, 1, 5, 12)),
+            timezone.make_aware(datetime(2020, 3, 7, 12)),
+            timezone.make_aware(datetime(2020, 3, 9, 12)),
+            timezone.make_aware(datetime(2022, 12, 31, 12)),
+        ]
+        for date in cls.dates:
+            post = Post.objects.create(author=author, text='Пост')
+            Post.objects.filter(pk=post.pk).update(pub_date=date)
+
+    def queryset(self):
+        return IndexSeekQuerySet(Post)
+
+    def test_dates_match_default_implementation(self):
+        """Даты по индексу совпадают с обычным dates()"""
+        cases = (
+            (Post.objects.all(), 'year'),
+            (Post.objects.all(), 'month'),
+            (Post.objects.filter(pub_date__year=2020), 'day'),
+        )
+        for queryset, kind in cases:
+            with self.subTest(kind=kind):
+                seek = IndexSeekQuerySet(Post, queryset.query)
+                self.assertEqual(
+                    seek.dates('pub_date', kind),
+                    list(queryset.dates('pub_date', kind)))
+
+    def test_min_and_max_are_read_from_index_edges(self):
+        """Min и Max считаются отдельными запросами по краям индекса"""
+        with self.assertNumQueries(2):
+            result = self.queryset().aggregate(
+                first=Min('pub_date'), last=Max('pub_date'))
+        self.assertEqual(result, {
+            'first': self.dates[0], 'last': self.dates[-1]})
@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class PostApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {number}',
+                group=cls.group if number % 2 else None)
+            for number in range(5)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_endpoints_return_same_posts_as_pages(self):
+        """JSON-ленты отдают те же посты, что и HTML-страницы"""
+        self.client.force_login(self.reader)
+        newest = [post.pk for post in reversed(self.posts)]
+        endpoints = {
+            reverse('posts:api_index'): newest,
+            reverse('posts:api_group_posts', kwargs={'slug': 'group'}): [
+                pk for pk in newest if pk in (
+                    self.posts[1].pk, self.posts[3].pk)],
+            reverse('posts:api_profile', kwargs={'username': 'author'}):
+                newest,
+            reverse('posts:api_follow_index'): newest,
+        }
+        for url, expected in endpoints.items():
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(
+                    [post['id'] for post in data['posts']], expected)
+
+    def test_cursor_pagination(self):
+        """Курсор next проходит всю ленту без повторов"""
+        url = reverse('posts:api_index') + '?limit=2&fields=id'
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            seen += [post['id'] for post in data['posts']]
+            url = data['next']
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+
+    def test_sparse_fields_and_include(self):
+        """fields выбирает поля, include встраивает автора и группу"""
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('posts:api_index'),
+                {'fields': 'id,text', 'include': 'author,group', 'limit': 1})
+        self.assertIn('Пост 4'.encode(), response.content)
+        post = response.json()['posts'][0]
+        self.assertEqual(post, {
+            'id': self.posts[4].pk,
+            'text': 'Пост 4',
+            'author': {
+                'id': self.author.pk, 'username': 'author',
+                'full_name': 'Лев Толстой',
+            },
+            'group': None,
+        })
+
+    def test_empty_fields_return_default_fields(self):
+        """Пустой fields отдаёт поля по умолчанию, а не пустые объекты"""
+        url = reverse('posts:api_index')
+        default = self.client.get(url, {'limit': 1}).json()['posts']
+        for fields in ('', ' , '):
+            with self.subTest(fields=fields):
+                response = self.client.get(
+                    url, {'fields': fields, 'limit': 1})
+                self.assertEqual(response.json()['posts'], default)
+
+    def test_errors(self):
+        """Неверные параметры, неизвестный автор и аноним в ленте подписок"""
+        url = reverse('posts:api_index')
+        cases = (
+            (url + '?fields=password', 400),
+            (url + '?include=comments', 400),
+            (url + '?limit=many', 400),
+            (url + '?after=broken', 400),
+            (reverse('posts:api_profile', kwargs={'username': 'nobody'}),
+             404),
+            (reverse('posts:api_follow_index'), 401),
+        )
+        for url, status in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+
+    def test_not_modified(self):
+        """Неизменившаяся лента отдаётся с кодом 304"""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
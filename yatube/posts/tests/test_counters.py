@@ -0,0 +1,104 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='GroupTest',
+            slug='SlugTest',
+            description='DescriptionTest',
+        )
+        cls.other_group = Group.objects.create(
+            title='GroupTest2',
+            slug='SlugTest2',
+            description='DescriptionTest2',
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за постами"""
+        post = Post.objects.create(
+            author=self.author, text='Text', group=self.group)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_save_of_stale_instance_keeps_counters(self):
+        """Сохранение устаревшего объекта не затирает счётчики"""
+        post = Post.objects.create(
+            author=self.author, text='Text', group=self.group)
+        group = Group.objects.get(pk=self.group.pk)
+        Comment.objects.create(post=post, author=self.user, text='Comment')
+        Post.objects.create(author=self.user, text='Text', group=self.group)
+        post.text = 'Edited'
+        post.save()
+        group.title = 'Renamed'
+        group.save()
+        post.refresh_from_db()
+        group.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.text, 'Edited')
+        self.assertEqual(group.posts_count, 2)
+        self.assertEqual(group.title, 'Renamed')
+
+    def test_comment_and_follow_counters(self):
+        """Счётчики комментариев и подписок следуют за объектами"""
+        post = Post.objects.create(author=self.author, text='Text')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Comment')
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters исправляет расхождения"""
+        post = Post.objects.create(
+            author=self.author, text='Text', group=self.group)
+        Comment.objects.create(post=post, author=self.user, text='Comment')
+        UserStats.objects.all().delete()
+        Group.objects.update(posts_count=42)
+        Post.objects.update(comments_count=42)
+
+        call_command('rebuild_counters', stdout=StringIO())
+
+        self.group.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
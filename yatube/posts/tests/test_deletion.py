@@ -0,0 +1,159 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import deletion, feeds, search
+from ..models import (Comment, DeletionJob, FeedEntry, Follow, Group, Post,
+                      UserStats)
+
+User = get_user_model()
+
+
+class DeletionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.posts = [
+            Post.objects.create(
+                author=self.author, text=f'Собака {number}',
+                group=self.group)
+            for number in range(3)
+        ]
+        self.other_post = Post.objects.create(
+            author=self.reader, text='Чужой пост', group=self.group)
+        for post in self.posts:
+            Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Comment.objects.create(
+            post=self.other_post, author=self.author, text='Ответ')
+
+    def count(self, model, **lookups):
+        return getattr(model, 'all_objects', model.objects).filter(
+            **lookups).count()
+
+    def test_deleted_post_is_hidden_at_once(self):
+        """Удалённый пост сразу пропадает из лент, поиска и счётчиков"""
+        post = self.posts[0]
+        deletion.schedule(post)
+        self.assertNotIn(post, Post.objects.all())
+        self.assertNotIn(post, feeds.timeline(self.reader))
+        self.assertNotIn(post, search.search_posts('собака')[0])
+        self.assertEqual(
+            self.client.get(reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk})
+            ).status_code, 404)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2)
+        self.assertEqual(Group.objects.get().posts_count, 3)
+        self.assertTrue(Comment.objects.filter(post=post).exists())
+
+    def test_purge_removes_post_rows_in_batches(self):
+        """Очистка удаляет пост, комментарии и записи лент порциями"""
+        post = self.posts[0]
+        job = deletion.schedule(post)
+        deletion.purge(job, batch_size=1)
+        self.assertEqual(self.count(Post, pk=post.pk), 0)
+        self.assertEqual(self.count(Comment, post=post.pk), 0)
+        self.assertEqual(self.count(FeedEntry, post=post.pk), 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2)
+        self.assertEqual(Group.objects.get().posts_count, 3)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.DONE)
+        self.assertEqual(job.deleted, 3)
+
+    def test_deleted_user_is_hidden_then_purged(self):
+        """Пользователь сразу скрыт, а его строки удаляет фоновая команда"""
+        deletion.schedule(self.author)
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertFalse(Post.objects.filter(author=self.author).exists())
+        self.assertEqual(list(feeds.timeline(self.reader)), [])
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 0)
+        self.assertEqual(search.search_posts('собака')[0], [])
+        self.assertFalse(self.other_post.comments.exists())
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.other_post.comments_count, 0)
+
+        out = StringIO()
+        call_command('purge_deletions', once=True, batch_size=2, stdout=out)
+        self.assertIn('Завершено задач: 1', out.getvalue())
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertEqual(self.count(Post), 1)
+        self.assertEqual(list(Comment.objects.all()), [])
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 0)
+        self.assertEqual(Post.objects.get().comments_count, 0)
+
+    def test_interrupted_purge_resumes(self):
+        """Прерванная очистка продолжается с сохранённого шага"""
+        job = deletion.schedule(self.author)
+        total = (
+            FeedEntry.objects.filter(post__author=self.author).count()
+            + Follow.objects.count() + self.count(Comment)
+            + self.count(Post, author=self.author) + 1
+        )
+        with mock.patch.object(
+            deletion.time, 'sleep', side_effect=[None, KeyboardInterrupt]
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                deletion.purge(job, batch_size=1, pause=1)
+        job = DeletionJob.objects.get()
+        self.assertEqual(job.deleted, 2)
+        deletion.purge(job, batch_size=1)
+        self.assertEqual(job.deleted, total)
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+
+    def test_failed_job_is_requeued(self):
+        """Повторное удаление возвращает упавшую задачу в очередь"""
+        job = deletion.schedule(self.posts[0])
+        DeletionJob.objects.filter(pk=job.pk).update(
+            status=DeletionJob.FAILED, attempts=3, error='locked')
+        job = deletion.schedule(self.posts[0])
+        self.assertEqual(
+            (job.status, job.attempts, job.error),
+            (DeletionJob.PENDING, 0, ''))
+        call_command('purge_deletions', once=True, stdout=StringIO())
+        self.assertEqual(self.count(Post, pk=self.posts[0].pk), 0)
+
+    def test_admin_delete_is_deferred(self):
+        """Удаление из админки ставит очистку в очередь"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        url = reverse('admin:auth_user_delete', args=(self.author.pk,))
+        with self.assertNumQueries(5):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, {'post': 'yes'})
+        self.assertTrue(User.objects.filter(pk=self.author.pk).exists())
+        self.assertTrue(DeletionJob.objects.filter(
+            kind=DeletionJob.USER, object_id=self.author.pk).exists())
+
+    def test_admin_delete_requires_related_permissions(self):
+        """Без прав на удаление связанных строк удаление запрещено"""
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        staff.user_permissions.set(Permission.objects.filter(
+            codename__in=('view_user', 'delete_user', 'delete_post')))
+        self.client.force_login(staff)
+        url = reverse('admin:auth_user_delete', args=(self.author.pk,))
+        response = self.client.get(url)
+        self.assertEqual(
+            response.context['perms_lacking'], {'comment', 'follow'})
+        self.client.post(url, {'post': 'yes'})
+        self.assertFalse(DeletionJob.objects.exists())
@@ -0,0 +1,119 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import deletion, export
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Привет, "мир"', group=cls.group)
+        cls.other_post = Post.objects.create(author=cls.other, text='Другой')
+        Post.objects.filter(pk=cls.other_post.pk).update(
+            pub_date=timezone.now() - timedelta(days=10))
+        Comment.objects.create(post=cls.post, author=cls.other, text='Ок')
+        Follow.objects.create(user=cls.other, author=cls.author)
+
+    def lines(self, content):
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_command_streams_ndjson_with_filters(self):
+        """Команда выгружает NDJSON с фильтрами по автору, группе и дате"""
+        cases = (
+            ({}, [self.post.pk, self.other_post.pk]),
+            ({'author': 'author'}, [self.post.pk]),
+            ({'group': 'group'}, [self.post.pk]),
+            ({'since': str(timezone.localdate() - timedelta(days=1))},
+             [self.post.pk]),
+            ({'until': str(timezone.localdate() - timedelta(days=5))},
+             [self.other_post.pk]),
+        )
+        for filters, expected in cases:
+            with self.subTest(filters=filters):
+                out = StringIO()
+                call_command('export_data', 'posts', stdout=out, **filters)
+                self.assertEqual(
+                    sorted(row['id'] for row in self.lines(out.getvalue())),
+                    sorted(expected))
+        out = StringIO()
+        call_command('export_data', 'comments', group='group', stdout=out)
+        self.assertEqual(self.lines(out.getvalue())[0]['text'], 'Ок')
+
+    def test_command_writes_gzip_csv(self):
+        """Сжатый CSV пишется в файл и читается обратно"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.csv.gz')
+            call_command('export_data', 'posts', format='csv', gzip=True,
+                         output=path, chunk_size=1)
+            with gzip.open(path, 'rt', encoding='utf-8') as dump:
+                lines = dump.read().splitlines()
+        self.assertEqual(lines[0], ','.join(export.DATASETS['posts'].columns))
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"Привет, ""мир"""', lines[1])
+
+    def test_rows_pending_deletion_are_skipped(self):
+        """Строки, ждущие фоновой очистки, не выгружаются"""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.other)
+        post = Post.objects.create(author=reader, text='Скрытый')
+        Comment.objects.create(post=post, author=self.author, text='Ответ')
+        deletion.schedule(post)
+        deletion.schedule(reader)
+        self.assertEqual(
+            [row[1] for row in export.rows('comments')[1]], [self.post.pk])
+        self.assertEqual(
+            [row[1:] for row in export.rows('follows')[1]],
+            [(self.other.pk, self.author.pk)])
+
+    def test_bad_parameters(self):
+        """Недопустимые фильтры отклоняются до чтения базы"""
+        with self.assertNumQueries(0):
+            for dataset, filters in (
+                ('follows', {'group': 'group'}),
+                ('posts', {'since': 'вчера'}),
+            ):
+                with self.subTest(dataset=dataset):
+                    with self.assertRaises(CommandError):
+                        call_command(
+                            'export_data', dataset, stdout=StringIO(),
+                            **filters)
+
+    def test_endpoint_is_streaming_and_staff_only(self):
+        """Выгрузка по HTTP потоковая и доступна только персоналу"""
+        url = reverse('posts:export', kwargs={'dataset': 'follows'})
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(url, {'gzip': '1'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('follows.ndjson.gz', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(self.lines(content.decode()), [{
+            'id': Follow.objects.get().pk,
+            'user_id': self.other.pk,
+            'author_id': self.author.pk,
+        }])
+        response = self.client.get(
+            reverse('posts:export', kwargs={'dataset': 'users'}))
+        self.assertEqual(response.status_code, 400)
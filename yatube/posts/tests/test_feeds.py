@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import feeds
+from ..models import FeedEntry, Follow, Post
+from ..paginators import CountFreePaginator
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.old_post = Post.objects.create(author=cls.author, text='Old')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка очищает её"""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertIn(self.old_post, feeds.timeline(self.user))
+        follow.delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        self.assertNotIn(self.old_post, feeds.timeline(self.user))
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает только в ленты подписчиков"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='New')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists())
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.other, post=post).exists())
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=2)
+    def test_popular_author_is_pulled_on_read(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(author=self.author, text='New')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        cache.clear()
+        timeline = list(feeds.timeline(self.user))
+        self.assertIn(post, timeline)
+        self.assertIn(self.old_post, timeline)
+        self.assertEqual(len(timeline), len(set(timeline)))
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=2)
+    def test_threshold_crossing_resets_pull_authors(self):
+        """Переход автора через порог сразу меняет способ чтения ленты"""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(feeds.pull_authors(self.user), [])
+        follow = Follow.objects.create(user=self.other, author=self.author)
+        self.assertEqual(feeds.pull_authors(self.user), [self.author.pk])
+        post = Post.objects.create(author=self.author, text='New')
+        self.assertIn(post, feeds.timeline(self.user))
+        follow.delete()
+        self.assertEqual(feeds.pull_authors(self.user), [])
+
+    def test_raw_saves_do_not_touch_feeds(self):
+        """Загрузка фикстур не раскладывает посты по лентам"""
+        Follow(user=self.other, author=self.author).save_base(raw=True)
+        Follow.objects.create(user=self.user, author=self.author)
+        Post(
+            author=self.author, text='Fixture', pub_date=timezone.now()
+        ).save_base(raw=True)
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('user_id', 'post_id')),
+            [(self.user.pk, self.old_post.pk)])
+
+    def test_rebuild_restores_feeds(self):
+        """Пересборка восстанавливает ленты по подпискам"""
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(author=self.other, text='Other')
+        FeedEntry.objects.all().delete()
+        self.assertEqual(feeds.rebuild(), 1)
+        self.assertEqual(list(feeds.timeline(self.user)), [self.old_post])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=2)
+    def test_hybrid_timeline_pages(self):
+        """Лента из записей и постов pull-автора листается без повторов"""
+        Follow.objects.create(user=self.user, author=self.other)
+        for number in range(3):
+            Post.objects.create(author=self.other, text=f'Other {number}')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'New {number}')
+        cache.clear()
+        expected = list(Post.objects.filter(
+            author__in=(self.author, self.other)))
+        paginator = CountFreePaginator(feeds.timeline(self.user), 2)
+        page = paginator.page(1)
+        seen = list(page.object_list)
+        while page.next_cursor:
+            page = paginator.page_after(page.next_cursor)
+            seen += page.object_list
+        self.assertEqual(seen, expected)
+        self.assertEqual(paginator.count, len(expected))
+        back = paginator.page_before(page.previous_cursor)
+        self.assertEqual(back.object_list, expected[4:6])
+        self.assertEqual(
+            list(paginator.page(2).object_list), expected[2:4])
@@ -0,0 +1,146 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import images
+from ..models import ImageJob, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_PROCESSING='sync')
+class RenditionsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def uploaded(self):
+        return SimpleUploadedFile(
+            name='small.gif', content=self.small_gif, content_type='image/gif')
+
+    def test_renditions_created_on_save(self):
+        """При сохранении поста готовится копия изображения для ленты"""
+        post = Post.objects.create(
+            author=self.author, text='Text', image=self.uploaded())
+        renditions = Post.objects.get(pk=post.pk).renditions
+        for name, size in images.RENDITIONS.items():
+            with self.subTest(name=name):
+                rendition = renditions[name]
+                self.assertEqual((rendition.width, rendition.height), size)
+                with default_storage.open(rendition.name) as stored:
+                    self.assertEqual(Image.open(stored).size, size)
+
+    def test_broken_image_does_not_break_save(self):
+        """Недоступный файл изображения не мешает сохранить пост"""
+        post = Post.objects.create(
+            author=self.author, text='Text', image='posts/missing.jpg')
+        self.assertEqual(Post.objects.get(pk=post.pk).renditions, {})
+
+    def test_generate_renditions_command(self):
+        """Команда generate_renditions обрабатывает старые изображения"""
+        post = Post.objects.create(
+            author=self.author, text='Text', image=self.uploaded())
+        Post.objects.filter(pk=post.pk).update(image_renditions='')
+        call_command('generate_renditions', stdout=StringIO())
+        self.assertIn('card', Post.objects.get(pk=post.pk).renditions)
+
+    def test_regenerated_renditions_replace_old_files(self):
+        """Пересозданные копии заменяют прежние файлы, а не копятся"""
+        post = Post.objects.create(
+            author=self.author, text='Text', image=self.uploaded())
+        old = images.rendition_paths(images.load_meta(post.image_renditions))
+        call_command('generate_renditions', '--force', stdout=StringIO())
+        post.refresh_from_db()
+        new = images.rendition_paths(images.load_meta(post.image_renditions))
+        self.assertTrue(new)
+        self.assertFalse(old & new)
+        self.assertFalse(any(default_storage.exists(path) for path in old))
+        self.assertTrue(all(default_storage.exists(path) for path in new))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_PROCESSING='queue')
+class ImageQueueTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def create_post(self):
+        buffer = BytesIO()
+        Image.new('RGB', (50, 50), (255, 0, 0)).save(buffer, 'PNG')
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Text',
+            'image': SimpleUploadedFile('queued.png', buffer.getvalue()),
+        })
+        return Post.objects.get(text='Text')
+
+    def test_placeholder_until_worker_runs(self):
+        """До обработки очереди вместо изображения показывается заглушка"""
+        post = self.create_post()
+        self.assertEqual(post.image_status, 'pending')
+        self.assertTrue(ImageJob.objects.filter(
+            post=post, status=ImageJob.PENDING).exists())
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        self.assertContains(self.client.get(url), 'Изображение обрабатывается')
+
+        built = []
+        for workers in ('0', '1'):
+            with self.subTest(workers=workers):
+                ImageJob.objects.update(status=ImageJob.PENDING)
+                call_command(
+                    'process_images', '--once', '--workers', workers,
+                    stdout=StringIO())
+                post.refresh_from_db()
+                self.assertEqual(post.image_status, 'ready')
+                self.assertEqual(
+                    ImageJob.objects.get(post=post).status, ImageJob.DONE)
+                built.append(images.rendition_paths(
+                    images.load_meta(post.image_renditions)))
+        first, last = built
+        self.assertFalse(any(default_storage.exists(path) for path in first))
+        self.assertTrue(all(default_storage.exists(path) for path in last))
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+        self.assertContains(response, post.renditions['card'].url)
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        """Сломанное изображение повторяется и затем помечается ошибкой"""
+        post = self.create_post()
+        default_storage.delete(post.image.name)
+        for _ in range(settings.IMAGE_JOB_MAX_ATTEMPTS):
+            call_command(
+                'process_images', '--once', '--workers', '0',
+                stdout=StringIO())
+        job = ImageJob.objects.get(post=post)
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertEqual(job.attempts, settings.IMAGE_JOB_MAX_ATTEMPTS)
+        post.refresh_from_db()
+        self.assertEqual(post.image_status, 'failed')
@@ -0,0 +1,187 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.caching import get_version
+
+from .. import importer, search
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.existing = Post.objects.create(author=cls.author, text='Старый')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def write(self, name, rows):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as output:
+            for row in rows:
+                output.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_data', *args, workers=0, batch_size=2,
+            stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_posts_are_loaded_and_derived_data_rebuilt(self):
+        """Посты загружаются, а счётчики, индекс и ленты пересобираются"""
+        path = self.write('posts.ndjson.gz', [
+            {'author': 'author', 'group': 'group', 'text': 'Импорт глаголов',
+             'pub_date': '2020-01-02T03:04:05+00:00', 'id': 1000},
+            {'author': 'author', 'text': 'Второй'},
+            {'author': 'author', 'text': 'Третий'},
+        ])
+        version = get_version(('profile', self.author.pk))
+        out, err = self.run_import('posts', path)
+        self.assertIn('Загружено: 3, с ошибками: 0', out)
+        self.assertEqual(err, '')
+        post = Post.objects.get(pk=1000)
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 4)
+        self.assertEqual(Group.objects.get().posts_count, 1)
+        self.assertEqual(list(search.matching(Post.objects, 'глагол')), [post])
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 4)
+        self.assertNotEqual(
+            get_version(('profile', self.author.pk)), version)
+        self.assertGreater(
+            Post.objects.create(author=self.author, text='Новый').pk, 1000)
+
+    def test_lookups_are_batched(self):
+        """Авторы и группы ищутся одним запросом на порцию"""
+        path = self.write('many.ndjson', [
+            {'author': 'author', 'group': 'group', 'text': f'Пост {number}'}
+            for number in range(10)
+        ])
+        shard = importer.shards([path])[0]
+        with CaptureQueriesContext(connection) as queries:
+            result = importer.load_shard('posts', shard, batch_size=2)
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertEqual(result['created'], 10)
+        self.assertEqual(statements.count('SELECT'), 2)
+        self.assertEqual(statements.count('INSERT'), 5)
+
+    def test_invalid_rows_are_reported(self):
+        """Строки с ошибками пропускаются и попадают в отчёт"""
+        path = os.path.join(self.directory, 'comments.csv')
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(
+                'post,author,text,id\n'
+                f'{self.existing.pk},reader,"Хороший, ""годный""",\n'
+                f'{self.existing.pk},nobody,Неизвестный автор,\n'
+                '999999,reader,Нет поста,\n'
+                f'{self.existing.pk},reader,,\n'
+                f'{self.existing.pk},reader,Повтор id,500\n'
+                f'{self.existing.pk},reader,Повтор id,500\n')
+        out, err = self.run_import('comments', path, '--skip-rebuild')
+        self.assertIn('Загружено: 2, с ошибками: 4', out)
+        self.assertIn('comments.csv:3: автор не найден: nobody', err)
+        self.assertIn('comments.csv:7: id 500 уже занят', err)
+        self.assertEqual(
+            set(Comment.objects.values_list('text', flat=True)),
+            {'Хороший, "годный"', 'Повтор id'})
+
+    def test_taken_ids_are_row_errors(self):
+        """Занятый id (в том числе удалённым постом или другим куском)"""
+        hidden = Post.objects.create(author=self.author, text='Скрытый')
+        Post.objects.filter(pk=hidden.pk).update(deleted=True)
+        first = self.write('first.ndjson', [
+            {'author': 'author', 'text': 'Первый', 'id': 2000},
+        ])
+        second = self.write('second.ndjson', [
+            {'author': 'author', 'text': 'Свой', 'id': 2001},
+            {'author': 'author', 'text': 'Удалённый', 'id': hidden.pk},
+            {'author': 'author', 'text': 'Чужой', 'id': 2000},
+        ])
+        importer.load_shard('posts', importer.shards([first])[0])
+        load = importer.Resolver.load
+
+        def ids_not_seen_yet(resolver, keys):
+            """Другой процесс записал id уже после проверки."""
+            if resolver.field != 'pk':
+                load(resolver, keys)
+
+        with mock.patch.object(importer.Resolver, 'load', ids_not_seen_yet):
+            result = importer.load_shard(
+                'posts', importer.shards([second])[0])
+        self.assertEqual((result['created'], result['failed']), (1, 2))
+        self.assertIn('second.ndjson@', result['errors'][-1])
+        self.assertEqual(
+            Post.all_objects.get(pk=hidden.pk).text, 'Скрытый')
+        self.assertEqual(Post.objects.get(pk=2001).text, 'Свой')
+
+        result = importer.load_shard('posts', importer.shards([second])[0])
+        self.assertEqual(result['failed'], 3)
+        self.assertIn(f'id {hidden.pk} уже занят', result['errors'][1])
+
+    def test_interrupted_import_still_rebuilds(self):
+        """После сбоя записанные порции учтены в счётчиках и лентах"""
+        path = self.write('broken.ndjson', [
+            {'author': 'author', 'text': f'Пост {number}'}
+            for number in range(4)
+        ])
+        build = importer.PostLoader.build
+
+        def failing_build(loader, row):
+            if row['text'] == 'Пост 2':
+                raise RuntimeError('сбой диска')
+            return build(loader, row)
+
+        with mock.patch.object(importer.PostLoader, 'build', failing_build):
+            with self.assertRaisesMessage(CommandError, 'сбой диска'):
+                self.run_import('posts', path)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 3)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 3)
+
+    def test_ndjson_shards_cover_every_line_once(self):
+        """Куски NDJSON делят файл без потерь и повторов"""
+        path = self.write('shards.ndjson', [
+            {'author': 'author', 'text': 'x' * number}
+            for number in range(1, 40)
+        ])
+        for count in (1, 3, 7, 64):
+            with self.subTest(count=count):
+                shards = importer.shards([path], count=count)
+                texts = [
+                    row['text'] for shard in shards
+                    for _, row in importer.read_rows(*shard)
+                ]
+                self.assertEqual(
+                    texts, ['x' * number for number in range(1, 40)])
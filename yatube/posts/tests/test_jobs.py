@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..jobs import JobQueue
+from ..models import DeletionJob
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.queue = JobQueue(DeletionJob, 'DELETION_JOB_STALE_AFTER')
+        self.jobs = [
+            DeletionJob.objects.create(kind=DeletionJob.POST, object_id=pk)
+            for pk in range(1, 4)
+        ]
+
+    def test_claim_takes_pending_jobs_once(self):
+        """Задача достаётся только одному обработчику"""
+        first = self.queue.claim(2)
+        self.assertEqual(first, [self.jobs[0].pk, self.jobs[1].pk])
+        self.assertEqual(self.queue.claim(2), [self.jobs[2].pk])
+        self.assertEqual(self.queue.claim(2), [])
+        job = DeletionJob.objects.get(pk=first[0])
+        self.assertEqual((job.status, job.attempts), (DeletionJob.RUNNING, 1))
+
+    @override_settings(DELETION_JOB_STALE_AFTER=60)
+    def test_stale_jobs_are_requeued(self):
+        """Задачи упавшего обработчика возвращаются в очередь"""
+        self.queue.claim(3)
+        DeletionJob.objects.filter(pk=self.jobs[0].pk).update(
+            updated=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.queue.requeue_stale(), 1)
+        self.assertEqual(list(self.queue.poll(3, once=True)), [
+            [self.jobs[0].pk]])
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..paginators import CountFreePaginator, KeysetPaginator
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.COUNT_POSTS_FOR_TEST = settings.COUNT_POSTS * 2 + 3
+        Post.objects.bulk_create(
+            Post(text=f'Post {number}', author=cls.author)
+            for number in range(cls.COUNT_POSTS_FOR_TEST)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_page(self, **query):
+        response = self.client.get(reverse('posts:index'), query)
+        return response.context['page_obj']
+
+    def test_cursor_pages_match_offset_pages(self):
+        """Листание по курсору совпадает с листанием по номеру страницы"""
+        page = self.get_page()
+        number = 1
+        while page.has_next():
+            number += 1
+            offset_page = self.get_page(page=number)
+            page = self.get_page(after=page.next_cursor)
+            self.assertEqual(page.number, number)
+            self.assertEqual(list(page), list(offset_page))
+        self.assertFalse(page.next_cursor)
+
+    def test_before_cursor_returns_previous_page(self):
+        """Токен before возвращает предыдущую страницу"""
+        second_page = self.get_page(page=2)
+        third_page = self.get_page(after=second_page.next_cursor)
+        previous = self.get_page(before=third_page.previous_cursor)
+        self.assertEqual(previous.number, 2)
+        self.assertEqual(list(previous), list(second_page))
+        first = self.get_page(before=second_page.previous_cursor)
+        self.assertEqual(list(first), list(self.get_page(page=1)))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Испорченный токен открывает первую страницу"""
+        page = self.get_page(after='not-a-cursor')
+        self.assertEqual(page.number, 1)
+        self.assertEqual(len(page), settings.COUNT_POSTS)
+
+    def test_cursor_round_trip(self):
+        """Курсор кодирует ключ сортировки и номер страницы"""
+        paginator = KeysetPaginator(Post.objects.all(), settings.COUNT_POSTS)
+        post = Post.objects.first()
+        values, number = paginator.decode_cursor(
+            paginator.encode_cursor(post, 7))
+        self.assertEqual(values, [post.pub_date, post.id])
+        self.assertEqual(number, 7)
+
+
+class CountFreePaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.COUNT_POSTS_FOR_TEST = 23
+        Post.objects.bulk_create(
+            Post(text=f'Post {number}', author=cls.author)
+            for number in range(cls.COUNT_POSTS_FOR_TEST)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_has_next_without_count(self):
+        """Наличие следующей страницы определяется без COUNT(*)"""
+        paginator = CountFreePaginator(Post.objects.all(), 10, count=1000)
+        page = paginator.get_page(3)
+        self.assertEqual(len(page), 3)
+        self.assertFalse(page.has_next())
+        self.assertEqual(paginator.num_pages, 3)
+        with self.assertNumQueries(1):
+            page = CountFreePaginator(
+                Post.objects.all(), 10, count=1000).get_page(2)
+        self.assertTrue(page.has_next())
+
+    def test_page_window_is_bounded(self):
+        """Окно номеров страниц ограничено независимо от их числа"""
+        paginator = CountFreePaginator(Post.objects.all(), 1, window=2)
+        page = paginator.get_page(10)
+        self.assertEqual(list(page.page_window), [8, 9, 10, 11, 12])
+        self.assertEqual(paginator.num_pages, self.COUNT_POSTS_FOR_TEST)
+
+    def test_count_is_cached(self):
+        """Точное число записей кешируется между запросами"""
+        CountFreePaginator(Post.objects.all(), 10).get_page(1)
+        with self.assertNumQueries(1):
+            CountFreePaginator(Post.objects.all(), 10).get_page(1)
+
+    def test_cursor_beyond_end_opens_last_page_without_count(self):
+        """Курсор за концом выборки открывает последнюю страницу без COUNT"""
+        paginator = CountFreePaginator(Post.objects.all(), 10)
+        cursor = paginator.encode_cursor(Post.objects.last(), 4)
+        with self.assertNumQueries(2):
+            page = paginator.page_after(cursor)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(list(page), list(Post.objects.all()[13:]))
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.previous_cursor)
+
+    @override_settings(PAGE_RANGE_WINDOW=1)
+    def test_default_window_is_read_from_settings(self):
+        """Окно по умолчанию берётся из настроек при создании"""
+        paginator = CountFreePaginator(Post.objects.all(), 1)
+        page = paginator.get_page(10)
+        self.assertEqual(list(page.page_window), [9, 10, 11])
+
+    def test_page_beyond_end_falls_back_to_last(self):
+        """Слишком большой номер страницы открывает последнюю"""
+        page = CountFreePaginator(Post.objects.all(), 10).get_page(99)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 3)
@@ -0,0 +1,133 @@
+import unittest
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .. import feeds, search
+from ..models import Comment, Follow, Group, Post
+from ..paginators import CountFreePaginator
+
+User = get_user_model()
+
+
+@unittest.skipUnless(
+    connection.vendor == 'sqlite', 'Разбор плана написан для SQLite')
+class QueryPlanTests(TestCase):
+    """Запросы лент идут по индексам, без полного обхода и сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.other)
+        cls.group = Group.objects.create(
+            title='Группа', slug='slug', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Текст')
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        return self.plan_sql(sql, params)
+
+    def plan_sql(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset):
+        table = queryset.model._meta.db_table
+        plan = self.plan(queryset)
+        for step in plan:
+            self.assertNotIn('TEMP B-TREE', step, plan)
+            if step.startswith(f'SCAN {table}'):
+                self.assertIn('USING', step, plan)
+
+    def pages(self, posts):
+        paginator = CountFreePaginator(posts, settings.COUNT_POSTS)
+        values = [self.post.pub_date, self.post.pk]
+        return {
+            'first': paginator.object_list[:settings.COUNT_POSTS + 1],
+            'after': paginator.object_list.filter(
+                paginator._keyset_filter(values, 'lt')
+            )[:settings.COUNT_POSTS + 1],
+        }
+
+    def test_feed_queries_use_indexes(self):
+        """Главная, группа и профиль читают посты по составному индексу"""
+        feeds = {
+            'index': Post.objects.select_related('author', 'group'),
+            'group': self.group.posts.select_related('author', 'group'),
+            'profile': self.author.posts.select_related('group'),
+        }
+        for name, posts in feeds.items():
+            for page, queryset in self.pages(posts).items():
+                with self.subTest(feed=name, page=page):
+                    self.assertUsesIndex(queryset)
+
+    def test_comments_use_index(self):
+        """Комментарии к посту читаются по индексу (post, -created)"""
+        self.assertUsesIndex(self.post.comments.select_related('author'))
+
+    def assertTimelineUsesIndexes(self):
+        paginator = CountFreePaginator(
+            feeds.timeline(self.reader).select_related('author', 'group'),
+            settings.COUNT_POSTS)
+        values = [self.post.pub_date, self.post.pk]
+        timelines = {
+            'first': paginator.object_list,
+            'after': paginator.object_list.filter(
+                paginator._keyset_filter(values, 'lt')),
+        }
+        for page, timeline in timelines.items():
+            querysets = list(timeline.querysets(settings.COUNT_POSTS + 1))
+            for queryset in querysets:
+                with self.subTest(page=page, sql=str(queryset.query)):
+                    self.assertUsesIndex(queryset)
+        return querysets
+
+    def test_follow_timeline_uses_feed_index(self):
+        """Лента подписок читается по индексу ленты, без сортировки"""
+        queryset, = self.assertTimelineUsesIndexes()
+        plan = self.plan(queryset)
+        self.assertTrue(any(
+            'feed_entry_user_date_idx' in step for step in plan), plan)
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_hybrid_timeline_uses_author_index(self):
+        """Посты pull-авторов читаются по индексу (author, -pub_date)"""
+        entries, *authors = self.assertTimelineUsesIndexes()
+        self.assertEqual(len(authors), 2)
+        for queryset in authors:
+            plan = self.plan(queryset)
+            self.assertTrue(any(
+                'post_author_pub_date_idx' in step for step in plan), plan)
+
+    def test_search_uses_fulltext_index(self):
+        """Поиск идёт по полнотекстовому индексу, посты — по ключу"""
+        posts = search.matching(
+            Post.objects.select_related('author', 'group'), 'текст')
+        with CaptureQueriesContext(connection) as queries:
+            search.search_posts('текст')
+        plans = [self.plan(posts)] + [
+            self.plan_sql(query['sql']) for query in queries]
+        table = Post._meta.db_table
+        for plan in plans:
+            with self.subTest(plan=plan):
+                self.assertTrue(any(
+                    'VIRTUAL TABLE INDEX' in step
+                    or f'SEARCH {table} USING INTEGER PRIMARY KEY' in step
+                    for step in plan), plan)
+                for step in plan:
+                    self.assertNotEqual(step.split()[:2], ['SCAN', table])
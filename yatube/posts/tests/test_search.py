@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.dogs = Post.objects.create(
+            author=cls.author, text='Собаки любят долгие прогулки')
+        cls.dog = Post.objects.create(
+            author=cls.author, text='Гуляли с собакой. Собака устала')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Кошки спят весь день')
+
+    def test_search_uses_stems(self):
+        """Поиск находит другие формы слова и ставит выше частые"""
+        found = [pk for pk, _ in search.ranked('собака')]
+        self.assertEqual(found, [self.dog.pk, self.dogs.pk])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        post = Post.objects.get(pk=self.cats.pk)
+        post.text = 'Собачий лай'
+        post.save()
+        self.assertEqual([pk for pk, _ in search.ranked('лай')], [post.pk])
+        post.delete()
+        self.assertEqual(search.ranked('лай'), [])
+
+    def test_results_are_paginated_by_cursor(self):
+        """Результаты листаются курсором без пропусков и повторов"""
+        first, cursor = search.search_posts('собака', per_page=1)
+        second, last_cursor = search.search_posts(
+            'собака', cursor, per_page=1)
+        self.assertEqual(first + second, [self.dog, self.dogs])
+        self.assertEqual(last_cursor, '')
+
+    def test_rebuild(self):
+        """Перестроенный индекс даёт те же результаты"""
+        self.assertEqual(search.rebuild(), 3)
+        self.assertEqual(len(search.ranked('кошка')), 1)
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты"""
+        response = self.client.get(reverse('posts:search'), {'q': 'кошки'})
+        self.assertEqual(response.context['posts'], [self.cats])
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кошки', 'after': 'broken'})
+        self.assertEqual(response.context['posts'], [self.cats])
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт по полнотекстовому индексу"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаками'})
+        self.assertEqual(
+            set(response.context['cl'].result_list), {self.dog, self.dogs})
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from math import ceil
@@ -6,11 +7,16 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from core.caching import get_version
+
 from ..forms import PostForm
-from ..models import Follow, Group, Post
+from ..models import Comment, Follow, Group, Post
+from ..views import index_scopes
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -72,6 +78,7 @@ class ViewsTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -237,7 +244,7 @@ class ViewsTests(TestCase):
             reverse('posts:index')
         )
         posts = response.content
-        Post.objects.all().delete()
+        Post.objects.update(text='TextChangedWithoutSignals')
         response = self.authorized_client.get(
             reverse('posts:index')
         )
@@ -247,3 +254,272 @@ class ViewsTests(TestCase):
             reverse('posts:index')
         )
         self.assertNotEqual(posts, response.content)
+
+    def test_cache_invalidated_by_changes(self):
+        """Изменение поста сразу сбрасывает закешированные страницы"""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in urls:
+            self.guest_client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'TextEditedForCache'
+        post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'TextEditedForCache')
+
+
+class UserInvalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user')
+
+    def versions(self):
+        return get_version(('index',), ('users',), ('profile', self.user.pk))
+
+    def test_only_displayed_names_invalidate_pages(self):
+        """Страницы сбрасывает только смена имени, а не пароль или вход"""
+        versions = self.versions()
+        User.objects.create_user(username='newcomer')
+        self.user.set_password('secret')
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertEqual(self.versions(), versions)
+        self.user.first_name = 'Лев'
+        self.user.save()
+        self.assertNotEqual(self.versions(), versions)
+
+
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='TextTest')
+        cls.COUNT_COMMENTS_FOR_TEST = settings.COUNT_COMMENTS + 5
+        for number in range(cls.COUNT_COMMENTS_FOR_TEST):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Comment {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.fragment_url = reverse(
+            'posts:comment_list', kwargs={'post_id': self.post.pk})
+
+    def test_detail_shows_first_page_of_comments(self):
+        """На странице поста только первая порция комментариев"""
+        response = self.client.get(self.detail_url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COUNT_COMMENTS)
+        self.assertEqual(comments[0].text, 'Comment 24')
+        self.assertContains(
+            response, f'Комментарии: {self.COUNT_COMMENTS_FOR_TEST}')
+        self.assertTrue(response.context['comments_page'].next_cursor)
+
+    def test_cached_comments_not_queried(self):
+        """Закешированный фрагмент комментариев не читает их из базы"""
+        self.client.get(self.detail_url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Comment 24')
+        table = Comment._meta.db_table
+        self.assertFalse(
+            [query for query in queries if table in query['sql']])
+
+    def test_fragment_returns_next_batch(self):
+        """Кнопка «Показать ещё» подгружает оставшиеся комментарии"""
+        cursor = self.client.get(
+            self.detail_url).context['comments_page'].next_cursor
+        response = self.client.get(self.fragment_url, {'after': cursor})
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertNotContains(response, 'data-more-comments')
+
+        response = self.client.get(
+            self.fragment_url, {'after': cursor, 'format': 'json'})
+        data = response.json()
+        self.assertEqual(data['count'], self.COUNT_COMMENTS_FOR_TEST)
+        self.assertEqual(data['next'], '')
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            [f'Comment {number}' for number in range(4, -1, -1)])
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='GroupTest', slug='SlugTest', description='Description')
+        cls.post = Post.objects.create(
+            author=cls.author, text='TextTest', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_unchanged_page_returns_not_modified(self):
+        """Неизменившаяся страница отдаётся с кодом 304"""
+        lookups = {url: 0 for url in self.urls[:2]}
+        lookups.update({url: 1 for url in self.urls[2:]})
+        for url, queries in lookups.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('Cookie', response['Vary'])
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_etag(self):
+        """После нового комментария или поста ETag меняется"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                Comment.objects.create(
+                    post=self.post, author=self.author, text='Comment')
+                Post.objects.create(
+                    author=self.author, text='New', group=self.group)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_and_user_pages_differ(self):
+        """Анонимный и личный варианты страницы имеют разные ETag"""
+        anonymous = self.client.get(self.urls[0])
+        self.client.force_login(self.author)
+        response = self.client.get(
+            self.urls[0], HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertTrue(anonymous.has_header('Last-Modified'))
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=cls.author, text='TextTest')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:profile', kwargs={'username': 'author'})
+
+    def test_anonymous_page_served_from_cache(self):
+        """Повторный анонимный запрос не рендерит шаблоны и не ходит в базу"""
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertIsNone(response.context)
+        self.assertContains(response, 'TextTest')
+        self.assertContains(response, 'Войти')
+
+    def test_holes_filled_for_user(self):
+        """Вошедший пользователь получает свою шапку и кнопку подписки"""
+        self.client.get(self.url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        response = self.client.get(self.url)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertTemplateUsed(response, 'includes/header_user.html')
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertContains(response, 'Отписаться')
+        self.assertNotContains(response, 'Войти')
+
+    def test_new_post_invalidates_page(self):
+        """Новый пост делает закешированную страницу устаревшей"""
+        self.client.get(self.url)
+        Post.objects.create(author=self.author, text='Fresh')
+        self.assertContains(self.client.get(self.url), 'Fresh')
+
+    @override_settings(CACHE_LOCK_WAIT=0)
+    def test_stale_feed_not_cached_under_new_version(self):
+        """Страница из старой ленты не сохраняется под новой версией"""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Fresh')
+        query_hash = hashlib.md5(b'').hexdigest()
+        lock = (f'lock:feed_page:index:{query_hash}:'
+                f'{get_version(*index_scopes(None))}')
+        cache.add(lock, 1)
+        self.assertNotContains(self.client.get(url), 'Fresh')
+        cache.delete(lock)
+        self.assertContains(self.client.get(url), 'Fresh')
+        self.assertContains(self.client.get(url), 'Fresh')
+
+
+class FollowButtonsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Text {author}')
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:index')
+        self.client.force_login(self.reader)
+
+    def follow_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Подписаться', count=4)
+        self.assertContains(response, 'Отписаться', count=1)
+        return [
+            query for query in queries.captured_queries
+            if 'posts_follow' in query['sql']
+        ]
+
+    @override_settings(PAGE_CACHE_VIEWS=())
+    def test_follow_state_loaded_once_per_page(self):
+        """Подписки на всех авторов страницы читаются одним запросом"""
+        self.assertEqual(len(self.follow_queries()), 1)
+        with override_settings(PAGE_CACHE_VIEWS=('posts:index',)):
+            self.client.logout()
+            self.client.get(self.url)
+            self.client.force_login(self.reader)
+            self.assertEqual(len(self.follow_queries()), 1)
+
+    def test_buttons_are_personal_in_cached_fragment(self):
+        """Закешированная лента показывает каждому его подписки"""
+        self.client.get(self.url)
+        self.client.force_login(self.other)
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Отписаться')
+        self.assertContains(response, 'Подписаться', count=5)
+
+    def test_follow_updates_buttons(self):
+        """После подписки лента и её ETag отражают новое состояние"""
+        etag = self.client.get(self.url)['ETag']
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author1'}))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отписаться', count=2)
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author1'}))
+        self.assertContains(
+            self.client.get(self.url), 'Отписаться', count=1)
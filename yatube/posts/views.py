@@ -1,68 +1,195 @@
+import hashlib
+
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import (HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+
+from core.caching import get_or_compute, get_version
+from core.conditional import conditional_on_versions
 
+from . import counters, export, feeds, follows, search
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post
+from .paginators import CountFreePaginator, InvalidCursor
 
 User = get_user_model()
 
 
-def paginate_posts(page_number, posts):
-    paginator = Paginator(posts, settings.COUNT_POSTS)
-    return paginator.get_page(page_number)
+def paginate_posts(query, posts, count=None, scopes=()):
+    paginator = CountFreePaginator(posts, settings.COUNT_POSTS, count=count)
+    if not scopes:
+        return paginator.page_from_query(query)
+    name = 'feed_page:' + ':'.join(str(part) for part in scopes[0])
+    query_hash = hashlib.md5(query.urlencode().encode()).hexdigest()
+    stale_key = f'{name}:{query_hash}'
+    state = get_or_compute(
+        'feed_page',
+        f'{stale_key}:{get_version(*scopes)}',
+        lambda: paginator.page_state(paginator.page_from_query(query)),
+        settings.FEED_PAGE_CACHE_TIMEOUT,
+        stale_key=stale_key
+    )
+    return paginator.restore_page(state)
+
+
+def index_scopes(request):
+    return [('index',)]
+
+
+def group_scopes(request, slug):
+    return [('group', slug), ('users',)]
 
 
+def profile_scopes(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    return [('profile', author_id), ('groups',)]
+
+
+def follow_scopes(user):
+    return [('follows', user.pk)]
+
+
+def post_scopes(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return [
+        ('post', post_id), ('profile', author_id), ('users',), ('groups',)
+    ]
+
+
+@conditional_on_versions(index_scopes, follow_scopes)
 def index(request):
     posts = Post.objects.select_related(
         'author', 'group')
-    page_number = request.GET.get('page')
+    scopes = index_scopes(request)
     context = {
-        'page_obj': paginate_posts(page_number, posts),
+        'page_obj': paginate_posts(request.GET, posts, scopes=scopes),
+        'cache_version': get_version(*scopes),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_on_versions(group_scopes, follow_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related(
         'author', 'group')
-    page_number = request.GET.get('page')
+    scopes = group_scopes(request, group.slug)
     context = {
-        'page_obj': paginate_posts(page_number, posts),
+        'page_obj': paginate_posts(
+            request.GET, posts, group.posts_count, scopes),
         'group': group,
+        'cache_version': get_version(*scopes),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_on_versions(profile_scopes, follow_scopes)
 def profile(request, username):
-    author = get_object_or_404(User.objects, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     posts = author.posts.select_related(
         'group', )
-    page_number = request.GET.get('page')
+    scopes = [('profile', author.pk), ('groups',)]
     context = {
-        'page_obj': paginate_posts(page_number, posts),
+        'page_obj': paginate_posts(
+            request.GET, posts, counters.get_stats(author).posts_count,
+            scopes),
         'author': author,
-        'following': (request.user.is_authenticated
-                      and author.following.filter(user=request.user).exists())
+        'cache_version': get_version(*scopes),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def paginate_comments(query, post):
+    """Страница комментариев по курсору ``(created, id)`` без COUNT."""
+    paginator = CountFreePaginator(
+        post.comments.select_related('author'),
+        settings.COUNT_COMMENTS,
+        count=post.comments_count,
+        keys=('created', 'id')
+    )
+    return paginator.page_from_query(query)
+
+
+@conditional_on_versions(post_scopes)
 def post_detail(request, post_id):
     post = get_object_or_404(Post.objects.select_related(
-        'author', 'group', ), pk=post_id)
+        'author', 'author__stats', 'group', ), pk=post_id)
+    # Комментарии выбираются только при пересчёте фрагмента post_comments.
+    comments_page = SimpleLazyObject(
+        lambda: paginate_comments(request.GET, post))
     context = {
         'post': post,
-        'comments': post.comments.select_related(
-            'author',),
-        'form': CommentForm()
+        'comments': SimpleLazyObject(lambda: comments_page.object_list),
+        'comments_page': comments_page,
+        'form': CommentForm(),
+        'cache_version': get_version(
+            ('post', post.pk), ('users',), ('groups',)),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_list(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post, pk=post_id)
+    comments_page = paginate_comments(request.GET, post)
+    if request.GET.get('format') == 'json':
+        next_url = ''
+        if comments_page.next_cursor:
+            next_url = '{}?after={}&format=json'.format(
+                reverse('posts:comment_list', args=(post.pk,)),
+                comments_page.next_cursor
+            )
+        return JsonResponse({
+            'count': post.comments_count,
+            'next': next_url,
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments_page.object_list
+            ],
+        })
+    context = {
+        'post': post,
+        'comments': comments_page.object_list,
+        'comments_page': comments_page,
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = [], ''
+    if query:
+        try:
+            posts, next_cursor = search.search_posts(
+                query, request.GET.get('after', ''))
+        except InvalidCursor:
+            posts, next_cursor = search.search_posts(query)
+    context = {
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -73,7 +200,7 @@ def post_create(request):
         'form': form,
     }
     if form.is_valid():
-        post = form.save()
+        post = form.save(commit=False)
         post.author = request.user
         post.save()
         return redirect('posts:profile', request.user)
@@ -117,12 +244,10 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.posts = Post.objects.select_related(
-        'author', 'group'
-    ).filter(author__following__user=request.user)
-    page_number = request.GET.get('page')
+    posts = feeds.timeline(request.user).select_related(
+        'author', 'group')
     context = {
-        'page_obj': paginate_posts(page_number, posts),
+        'page_obj': paginate_posts(request.GET, posts),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -132,6 +257,7 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
         Follow.objects.get_or_create(user=request.user, author=author)
+        follows.forget(request)
     return redirect('posts:profile', username=username)
 
 
@@ -139,4 +265,27 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
+    follows.forget(request)
     return redirect('posts:profile', username=username)
+
+
+@staff_member_required
+def export_data(request, dataset):
+    fmt = request.GET.get('format', 'ndjson')
+    compress = request.GET.get('gzip') == '1'
+    try:
+        chunks = export.stream(
+            dataset, fmt, compress,
+            author=request.GET.get('author'),
+            group=request.GET.get('group'),
+            since=request.GET.get('since'),
+            until=request.GET.get('until'))
+    except export.ExportError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        chunks,
+        content_type=(
+            'application/gzip' if compress else export.CONTENT_TYPES[fmt]))
+    response['Content-Disposition'] = (
+        f'attachment; filename="{export.filename(dataset, fmt, compress)}"')
+    return response
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from posts.admin import DeferredDeletionMixin
+
+User = get_user_model()
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class UserAdmin(DeferredDeletionMixin, BaseUserAdmin):
+    pass
@@ -1,7 +1,52 @@
 import os
 
+from core.cache_config import caches_from_url
+
 COUNT_POSTS = 10
+API_MAX_LIMIT = 100
+COUNT_COMMENTS = 20
 COUNT_SYMBOLS = 30
+PAGE_RANGE_WINDOW = 2
+PAGINATOR_COUNT_TIMEOUT = 60
+PAGINATOR_ESTIMATE_MIN_ROWS = 100000
+FEED_BACKFILL_LIMIT = 1000
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_PULL_AUTHORS_TIMEOUT = 300
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+FEED_PAGE_CACHE_TIMEOUT = 60 * 10
+FOLLOWED_AUTHORS_CACHE_TIMEOUT = 60 * 60
+CACHE_STALE_TIMEOUT = 60 * 5
+CACHE_EARLY_EXPIRY_BETA = 1.0
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT = 0.5
+CACHE_LOCK_POLL_INTERVAL = 0.05
+CACHE_L1_TIMEOUT = 2
+IMAGE_PROCESSING = 'queue'
+IMAGE_JOB_MAX_ATTEMPTS = 3
+IMAGE_JOB_STALE_AFTER = 60 * 10
+DELETION_BATCH_SIZE = 500
+DELETION_JOB_MAX_ATTEMPTS = 3
+DELETION_JOB_STALE_AFTER = 60 * 10
+PAGE_CACHE_TIMEOUT = 60 * 10
+PAGE_CACHE_VIEWS = ('posts:index', 'posts:group_posts', 'posts:profile')
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_posts': 4,
+    'posts:profile': 7,
+    'posts:post_detail': 5,
+    'posts:comment_list': 2,
+    'posts:follow_index': 6,
+    'posts:search': 2,
+    'posts:api_index': 3,
+    'posts:api_group_posts': 4,
+    'posts:api_profile': 5,
+    'posts:api_follow_index': 4,
+}
+QUERY_BUDGET_STRICT = False
+QUERY_REPEAT_LIMIT = 2
+QUERY_STATS_HEADERS = True
+REPLICA_PIN_COOKIE = 'pin_primary'
+REPLICA_PIN_SECONDS = 10
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -40,11 +85,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PageHoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,7 +104,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +113,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.fragment_cache',
+                'posts.context_processors.followed_authors',
             ],
         },
     },
@@ -77,11 +128,29 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Реплики для чтения, например копии SQLite:
+# YATUBE_DB_REPLICAS=/srv/replica1.sqlite3,/srv/replica2.sqlite3
+for number, name in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'core.db.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
+TEST_RUNNER = 'core.test_runner.QueryBudgetRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -127,8 +196,10 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
+# Общий кеш, например YATUBE_CACHE_URL=redis://10.0.0.1:6379,10.0.0.2:6379/1
+# (форматы — в core.cache_config). YATUBE_CACHE_L1_TIMEOUT — сколько секунд
+# процесс держит прочитанные значения у себя, 0 — не держит.
+CACHES = caches_from_url(
+    os.environ.get('YATUBE_CACHE_URL', ''),
+    int(os.environ.get('YATUBE_CACHE_L1_TIMEOUT', CACHE_L1_TIMEOUT)),
+)